@@ -0,0 +1,358 @@
+"""
+In-memory checkpointer with a bound on memory, for when Redis is unavailable.
+
+MemorySaver keeps every checkpoint of every thread for the life of the process.
+BoundedMemorySaver keeps the same structures, but tracks the bytes each thread holds
+and, once more than `max_threads` threads or `max_bytes` bytes are in memory, moves
+the least recently used threads to a local SQLite file. A spilled thread is loaded
+back the next time it is read or written, so callers never see the difference.
+
+The spill file only extends memory: it is cleared when the saver starts, like
+MemorySaver's contents are lost on restart. Listing without a thread_id only covers
+threads currently in memory. The async methods run the sync ones in a worker thread,
+so a spill or reload never blocks the event loop.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Iterator, Optional, Sequence
+
+import ormsgpack
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import ChannelVersions, Checkpoint, CheckpointMetadata, CheckpointTuple
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+
+
+class BoundedMemorySaver(InMemorySaver):
+    """InMemorySaver that spills cold threads to disk past `max_threads` / `max_bytes`."""
+
+    def __init__(
+        self,
+        max_threads: int = 1000,
+        max_bytes: int = 128 * 1024 * 1024,
+        spill_path: str = "checkpoint_spill.sqlite",
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        super().__init__(serde=serde)
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.spill_path = spill_path
+        # thread_id -> bytes held in memory, least recently used first
+        self._sizes: OrderedDict[str, int] = OrderedDict()
+        # thread_id -> (writes keys, blobs keys), so a thread can be moved without scanning everything
+        self._keys: dict[str, tuple[set, set]] = {}
+        self._bytes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+        # Threads currently in the spill file, so misses don't need a disk lookup
+        self._spilled: set[str] = set()
+        # Sync methods may be called from worker threads (graph.invoke / run_in_executor)
+        self._lock = threading.RLock()
+        self._stats = {"spills": 0, "reloads": 0, "spilled_bytes": 0}
+
+    # --- Spill store ---
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.spill_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.spill_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=OFF")
+            self._conn.execute("DROP TABLE IF EXISTS spilled_threads")
+            self._conn.execute(
+                "CREATE TABLE spilled_threads (thread_id TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL)"
+            )
+        return self._conn
+
+    def _spill(self, thread_id: str):
+        """Moves one thread's checkpoints, writes and blobs from memory to the spill file."""
+        write_keys, blob_keys = self._keys.pop(thread_id, (set(), set()))
+        data = {"storage": [], "writes": [], "blobs": []}
+        for ns, checkpoints in self.storage.pop(thread_id, {}).items():
+            for checkpoint_id, (checkpoint, metadata, parent) in checkpoints.items():
+                data["storage"].append([ns, checkpoint_id, *checkpoint, *metadata, parent])
+        for key in write_keys:
+            _, ns, checkpoint_id = key
+            for (task_id, idx), (_, channel, value, task_path) in self.writes.pop(key, {}).items():
+                data["writes"].append([ns, checkpoint_id, task_id, idx, channel, *value, task_path])
+        for key in blob_keys:
+            _, ns, channel, version = key
+            data["blobs"].append([ns, channel, version, *self.blobs.pop(key)])
+        size = self._sizes.pop(thread_id, 0)
+        self._bytes -= size
+        conn = self._db()
+        conn.execute(
+            "INSERT OR REPLACE INTO spilled_threads (thread_id, data, size) VALUES (?, ?, ?)",
+            (thread_id, ormsgpack.packb(data), size),
+        )
+        conn.commit()
+        self._spilled.add(thread_id)
+        self._stats["spills"] += 1
+        self._stats["spilled_bytes"] += size
+
+    def _reload(self, thread_id: str) -> bool:
+        if thread_id not in self._spilled:
+            return False
+        row = self._conn.execute(
+            "SELECT data, size FROM spilled_threads WHERE thread_id = ?", (thread_id,)
+        ).fetchone()
+        if row is None:
+            return False
+        data = ormsgpack.unpackb(row[0])
+        write_keys, blob_keys = self._keys.setdefault(thread_id, (set(), set()))
+        for ns, checkpoint_id, cp_type, cp_bytes, md_type, md_bytes, parent in data["storage"]:
+            self.storage[thread_id][ns][checkpoint_id] = ((cp_type, cp_bytes), (md_type, md_bytes), parent)
+        for ns, checkpoint_id, task_id, idx, channel, type_, value, task_path in data["writes"]:
+            outer_key = (thread_id, ns, checkpoint_id)
+            self.writes[outer_key][(task_id, idx)] = (task_id, channel, (type_, value), task_path)
+            write_keys.add(outer_key)
+        for ns, channel, version, type_, value in data["blobs"]:
+            key = (thread_id, ns, channel, version)
+            self.blobs[key] = (type_, value)
+            blob_keys.add(key)
+        self._conn.execute("DELETE FROM spilled_threads WHERE thread_id = ?", (thread_id,))
+        self._conn.commit()
+        self._spilled.discard(thread_id)
+        self._sizes[thread_id] = row[1]
+        self._bytes += row[1]
+        self._stats["reloads"] += 1
+        self._stats["spilled_bytes"] -= row[1]
+        return True
+
+    # --- Accounting ---
+
+    def _touch(self, thread_id: str):
+        """Marks the thread as recently used, loading it back from disk if it was spilled."""
+        thread_id = str(thread_id)
+        if thread_id in self._sizes:
+            self._sizes.move_to_end(thread_id)
+        elif self._reload(thread_id):
+            self._evict(keep=thread_id)
+
+    def _grow(self, thread_id: str, nbytes: int):
+        thread_id = str(thread_id)
+        self._sizes[thread_id] = self._sizes.get(thread_id, 0) + nbytes
+        self._sizes.move_to_end(thread_id)
+        self._bytes += nbytes
+        self._evict(keep=thread_id)
+
+    def _evict(self, keep: str):
+        while len(self._sizes) > self.max_threads or self._bytes > self.max_bytes:
+            coldest = next(iter(self._sizes))
+            if coldest == keep:
+                # The only thread left is the one in use
+                break
+            self._spill(coldest)
+
+    # --- Checkpointer interface (the async versions run these in a worker thread) ---
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._lock:
+            thread_id = str(config["configurable"]["thread_id"])
+            self._touch(thread_id)
+            item = super().get_tuple(config)
+            if thread_id not in self._sizes:
+                # InMemorySaver's defaultdict adds an empty entry for unknown threads
+                self.storage.pop(thread_id, None)
+            return item
+
+    def list(self, config: Optional[RunnableConfig], **kwargs) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            if config:
+                self._touch(config["configurable"]["thread_id"])
+            # Materialized so spills triggered by other calls can't change storage mid-iteration
+            items = list(super().list(config, **kwargs))
+        yield from items
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            self._touch(thread_id)
+            next_config = super().put(config, checkpoint, metadata, new_versions)
+            stored_checkpoint, stored_metadata, _ = self.storage[thread_id][checkpoint_ns][checkpoint["id"]]
+            added = len(stored_checkpoint[1]) + len(stored_metadata[1])
+            _, blob_keys = self._keys.setdefault(str(thread_id), (set(), set()))
+            for channel, version in new_versions.items():
+                key = (thread_id, checkpoint_ns, channel, version)
+                blob_keys.add(key)
+                added += len(self.blobs[key][1])
+            self._grow(thread_id, added)
+            return next_config
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            outer_key = (thread_id, config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+            self._touch(thread_id)
+            before = sum(len(value[1]) for _, _, value, _ in self.writes.get(outer_key, {}).values())
+            super().put_writes(config, writes, task_id, task_path)
+            after = sum(len(value[1]) for _, _, value, _ in self.writes.get(outer_key, {}).values())
+            self._keys.setdefault(str(thread_id), (set(), set()))[0].add(outer_key)
+            self._grow(thread_id, after - before)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            thread_id = str(thread_id)
+            write_keys, blob_keys = self._keys.pop(thread_id, (set(), set()))
+            self.storage.pop(thread_id, None)
+            for key in write_keys:
+                self.writes.pop(key, None)
+            for key in blob_keys:
+                self.blobs.pop(key, None)
+            self._bytes -= self._sizes.pop(thread_id, 0)
+            if thread_id in self._spilled:
+                self._conn.execute("DELETE FROM spilled_threads WHERE thread_id = ?", (thread_id,))
+                self._conn.commit()
+                self._spilled.discard(thread_id)
+
+    def get_delta_channel_history(self, *, config: RunnableConfig, channels: Sequence[str]):
+        with self._lock:
+            self._touch(config["configurable"]["thread_id"])
+            return super().get_delta_channel_history(config=config, channels=channels)
+
+    # --- Async interface: any call may spill or reload a thread, so none runs on the event loop ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], **kwargs) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, **kwargs)))
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aget_delta_channel_history(self, *, config: RunnableConfig, channels: Sequence[str]):
+        return await asyncio.to_thread(lambda: self.get_delta_channel_history(config=config, channels=channels))
+
+    def stats(self) -> dict:
+        with self._lock:
+            spilled = len(self._spilled)
+            return {
+                "threads_in_memory": len(self._sizes),
+                "bytes_in_memory": self._bytes,
+                "max_threads": self.max_threads,
+                "max_bytes": self.max_bytes,
+                "threads_spilled": spilled,
+                **self._stats,
+            }
+
+
+if __name__ == "__main__":
+    import tempfile
+    import time
+
+    from langchain_core.messages import AIMessage, HumanMessage
+    from langgraph.checkpoint.base import empty_checkpoint
+    from langgraph.checkpoint.base.id import uuid6
+
+    THREADS, TURNS = 500, 5
+    MESSAGES = [HumanMessage(content="How do I market my app? " * 5), AIMessage(content="Here is a strategy. " * 60)]
+
+    def run(saver):
+        for turn in range(TURNS):
+            for i in range(THREADS):
+                config = saver.get_tuple({"configurable": {"thread_id": f"t{i}", "checkpoint_ns": ""}})
+                config = config.config if config else {"configurable": {"thread_id": f"t{i}", "checkpoint_ns": ""}}
+                checkpoint = empty_checkpoint()
+                checkpoint["id"] = str(uuid6(clock_seq=turn))
+                checkpoint["channel_values"] = {"messages": MESSAGES * (turn + 1)}
+                version = saver.get_next_version(None, None)
+                checkpoint["channel_versions"] = {"messages": version}
+                config = saver.put(config, checkpoint, {"step": turn}, {"messages": version})
+                saver.put_writes(config, [("messages", MESSAGES[-1:])], task_id=f"task-{turn}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        saver = BoundedMemorySaver(max_threads=100, max_bytes=4 * 1024 * 1024, spill_path=os.path.join(tmp, "spill.sqlite"))
+        t = time.perf_counter()
+        run(saver)
+        elapsed = time.perf_counter() - t
+        stats = saver.stats()
+        print(f"{THREADS} threads x {TURNS} turns in {elapsed:.2f}s: {stats['threads_in_memory']} threads / "
+              f"{stats['bytes_in_memory'] / 1024 / 1024:.1f} MB in memory, {stats['threads_spilled']} spilled "
+              f"({stats['spilled_bytes'] / 1024 / 1024:.1f} MB), {stats['spills']} spills, {stats['reloads']} reloads")
+
+        reference = InMemorySaver()
+        run(reference)
+        for i in (0, THREADS // 2, THREADS - 1):
+            config = {"configurable": {"thread_id": f"t{i}", "checkpoint_ns": ""}}
+            ours, theirs = saver.get_tuple(config), reference.get_tuple(config)
+            assert ours.checkpoint["channel_values"] == theirs.checkpoint["channel_values"]
+            assert ours.pending_writes == theirs.pending_writes
+            assert len(list(saver.list(config))) == TURNS
+        saver.delete_thread("t0")
+        assert saver.get_tuple({"configurable": {"thread_id": "t0", "checkpoint_ns": ""}}) is None
+        print("Spilled threads reload with the same state as MemorySaver")
+
+    async def arun(saver):
+        for turn in range(TURNS):
+            for i in range(THREADS):
+                root = {"configurable": {"thread_id": f"t{i}", "checkpoint_ns": ""}}
+                item = await saver.aget_tuple(root)
+                checkpoint = empty_checkpoint()
+                checkpoint["id"] = str(uuid6(clock_seq=turn))
+                checkpoint["channel_values"] = {"messages": MESSAGES * (turn + 1)}
+                version = saver.get_next_version(None, None)
+                checkpoint["channel_versions"] = {"messages": version}
+                config = await saver.aput(item.config if item else root, checkpoint, {"step": turn}, {"messages": version})
+                await saver.aput_writes(config, [("messages", MESSAGES[-1:])], task_id=f"task-{turn}")
+
+    async def loop_stalls():
+        # Longest gap between 1 ms heartbeats while the async API spills and reloads threads
+        with tempfile.TemporaryDirectory() as tmp:
+            saver = BoundedMemorySaver(max_threads=100, max_bytes=4 * 1024 * 1024, spill_path=os.path.join(tmp, "spill.sqlite"))
+            done = asyncio.Event()
+            worst = 0.0
+
+            async def heartbeat():
+                nonlocal worst
+                last = time.perf_counter()
+                while not done.is_set():
+                    await asyncio.sleep(0.001)
+                    now = time.perf_counter()
+                    worst = max(worst, now - last)
+                    last = now
+
+            beat = asyncio.create_task(heartbeat())
+            await arun(saver)
+            done.set()
+            await beat
+            stats = saver.stats()
+            print(f"Async API: {stats['spills']} spills, {stats['reloads']} reloads, "
+                  f"longest event loop stall {worst * 1000:.1f} ms")
+
+    asyncio.run(loop_stalls())
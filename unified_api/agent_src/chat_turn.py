@@ -0,0 +1,111 @@
+"""
+One chat turn in a single streaming pass.
+
+/chat used to stream the graph in "updates" mode for the response text and then call
+aget_state to read satisfaction/strategies, which reloaded the checkpoint the turn had
+just written. Streaming "updates" and "values" together gives both in one pass: the
+last "values" chunk is the state the turn ended with.
+
+Run `python -m agent_src.chat_turn` from unified_api/ to count checkpoint reads per turn.
+"""
+from typing import Any, NamedTuple
+
+
+class TurnResult(NamedTuple):
+    response: str
+    values: dict
+    interrupted: bool
+
+    @property
+    def is_complete(self) -> bool:
+        # Same rule as the old aget_state check: satisfied, or nothing left to run
+        return bool(self.values.get("satisfaction", False)) or not self.interrupted
+
+
+async def run_turn(graph_app, inputs: dict, config: dict, **kwargs: Any) -> TurnResult:
+    """Runs the graph once; returns the response text and the final state values."""
+    full_response = ""
+    values: dict = {}
+    interrupted = False
+    async for mode, chunk in graph_app.astream(inputs, config, stream_mode=["updates", "values"], **kwargs):
+        if mode == "values":
+            values = chunk
+            continue
+        for node_name, output_value in chunk.items():
+            if node_name == "__interrupt__":
+                interrupted = True
+            elif output_value and "messages" in output_value and output_value["messages"]:
+                content = output_value["messages"][-1].content
+                if content:
+                    full_response += content + "\n\n"
+    return TurnResult(full_response.strip(), values, interrupted)
+
+
+if __name__ == "__main__":
+    import asyncio
+    import os
+    import tempfile
+    from typing import Annotated, Optional, TypedDict
+
+    from langchain_core.messages import AIMessage, HumanMessage
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    from langgraph.graph import END, StateGraph
+    from langgraph.graph.message import add_messages
+
+    from .checkpoint_cache import CachedCheckpointSaver
+
+    TURNS = 20
+
+    class State(TypedDict):
+        messages: Annotated[list, add_messages]
+        strategies: Optional[list]
+        satisfaction: Optional[bool]
+
+    def reply(state: State) -> dict:
+        return {"messages": [AIMessage(content=f"Reply {len(state['messages'])}")], "strategies": ["a", "b"]}
+
+    class CountingSaver(AsyncSqliteSaver):
+        """Counts checkpoint reads that reach SQLite."""
+
+        reads = 0
+
+        async def aget_tuple(self, config):
+            CountingSaver.reads += 1
+            return await super().aget_tuple(config)
+
+    async def old_turn(graph_app, inputs, config):
+        # The previous /chat flow: updates-mode stream, then aget_state
+        async for _ in graph_app.astream(inputs, config):
+            pass
+        state = await graph_app.aget_state(config)
+        return state.values
+
+    async def new_turn(graph_app, inputs, config):
+        return (await run_turn(graph_app, inputs, config)).values
+
+    async def measure(name, turn, cached):
+        with tempfile.TemporaryDirectory() as tmp:
+            async with AsyncSqliteSaver.from_conn_string(os.path.join(tmp, "checkpoints.sqlite")) as saver:
+                counting = CountingSaver(saver.conn)
+                checkpointer = CachedCheckpointSaver(counting) if cached else counting
+                graph = StateGraph(State)
+                graph.add_node("reply", reply)
+                graph.set_entry_point("reply")
+                graph.add_edge("reply", END)
+                graph_app = graph.compile(checkpointer=checkpointer)
+
+                config = {"configurable": {"thread_id": "bench"}}
+                # Warm-up turn: the session's first read always misses
+                await turn(graph_app, {"messages": [HumanMessage(content="hi")]}, config)
+                CountingSaver.reads = 0
+                for i in range(TURNS):
+                    values = await turn(graph_app, {"messages": [HumanMessage(content=f"turn {i}")]}, config)
+                assert values["strategies"] == ["a", "b"]
+                print(f"{name:>32}: {CountingSaver.reads / TURNS:.1f} checkpoint reads per turn")
+
+    async def main():
+        await measure("astream + aget_state", old_turn, cached=False)
+        await measure("single pass", new_turn, cached=False)
+        await measure("single pass + checkpoint cache", new_turn, cached=True)
+
+    asyncio.run(main())
@@ -0,0 +1,91 @@
+"""
+Checkpoint write benchmark for the checkpointer backends.
+
+Each simulated session writes WRITES_PER_SESSION checkpoints (aput + aput_writes, the
+pair LangGraph issues per super-step) with a realistic message payload and reads its
+latest state back after each one, like a chat turn does. Reports writes/sec and
+p50/p99 write latency.
+
+    python -m agent_src.checkpoint_benchmark --sessions 1 10 100
+    python -m agent_src.checkpoint_benchmark --backends sqlite sharded --sessions 100
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from typing import Callable
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.checkpoint.base.id import uuid6
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from .checkpoint_serde import CompactSerializer
+from .sqlite_checkpointer import TunedSqliteSaver
+from .sharded_checkpointer import ShardedSaver
+
+WRITES_PER_SESSION = 20
+MESSAGES = [HumanMessage(content="How do I market my app? " * 5), AIMessage(content="Here is a strategy. " * 60)] * 5
+
+# Backend name -> function opening a saver inside a scratch directory
+BACKENDS: dict[str, Callable] = {
+    "sqlite": lambda tmp: AsyncSqliteSaver.from_conn_string(os.path.join(tmp, "checkpoints.sqlite")),
+    "sqlite_tuned": lambda tmp: TunedSqliteSaver.from_path(os.path.join(tmp, "checkpoints.sqlite")),
+    "sharded": lambda tmp: ShardedSaver.from_pattern(os.path.join(tmp, "checkpoints.shard{}.sqlite"), 4),
+    "sqlite_tuned_compact": lambda tmp: TunedSqliteSaver.from_path(
+        os.path.join(tmp, "checkpoints.sqlite"), serde=CompactSerializer()
+    ),
+}
+
+
+def sample_checkpoint(step: int):
+    checkpoint = empty_checkpoint()
+    checkpoint["id"] = str(uuid6(clock_seq=step))
+    checkpoint["channel_values"] = {"messages": MESSAGES, "product_details": "Name: FitTrack"}
+    return checkpoint
+
+
+async def _session(saver, thread_id: str, latencies: list):
+    config = {"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}}
+    for step in range(WRITES_PER_SESSION):
+        checkpoint = sample_checkpoint(step)
+        t = time.perf_counter()
+        config = await saver.aput(config, checkpoint, {"source": "loop", "step": step}, {})
+        await saver.aput_writes(config, [("messages", MESSAGES[-1:])], task_id=f"task-{step}")
+        latencies.append(time.perf_counter() - t)
+        await saver.aget_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+
+
+async def run_write_benchmark(open_saver: Callable, sessions: int) -> dict:
+    """Runs `sessions` concurrent sessions against a fresh saver; returns throughput and latency."""
+    with tempfile.TemporaryDirectory() as tmp:
+        async with open_saver(tmp) as saver:
+            await saver.setup()
+            latencies: list = []
+            t = time.perf_counter()
+            await asyncio.gather(*(_session(saver, f"thread-{i}", latencies) for i in range(sessions)))
+            elapsed = time.perf_counter() - t
+    return {
+        "writes_per_sec": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": (statistics.quantiles(latencies, n=100)[98] if len(latencies) > 1 else latencies[0]) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark checkpoint writes per checkpointer backend.")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--sessions", nargs="+", type=int, default=[1, 10, 100])
+    args = parser.parse_args()
+
+    async def main():
+        for sessions in args.sessions:
+            for name in args.backends:
+                result = await run_write_benchmark(BACKENDS[name], sessions)
+                print(f"{name:>20} | {sessions:>3} sessions | {result['writes_per_sec']:>8.0f} writes/s | "
+                      f"p50 {result['p50_ms']:>7.2f} ms | p99 {result['p99_ms']:>7.2f} ms")
+
+    asyncio.run(main())
@@ -0,0 +1,262 @@
+"""
+Per-process cache of each thread's latest root checkpoint, in front of any checkpointer.
+
+A chat turn reads the thread's latest checkpoint when astream starts, and history views
+read it again. The cache is write-through: aput/aput_writes go to the wrapped saver first
+and then replace the cached entry, so root-graph reads of a hot session never reach
+SQLite or Redis.
+
+Only the root namespace ("") is cached. The marketing subgraph checkpoints under a new
+`marketing_agent:<task_id>` namespace every turn, which is never read again, so those
+calls go straight to the wrapped saver and are not counted in the stats.
+
+Entries are kept serialized (as the wrapped saver stores them), which gives exact byte
+accounting and keeps cached state isolated from objects the graph later mutates. Least
+recently used threads are evicted once the total passes `max_bytes`.
+
+The cache only sees writes made through this process. With several API workers on a
+shared backend (CHECKPOINTER_BACKEND=redis) enable it only if sessions are sticky to a
+worker; CHECKPOINT_CACHE_ENABLED defaults to off for that backend.
+"""
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+# Rough per-entry bookkeeping cost on top of the serialized payloads
+ENTRY_OVERHEAD = 512
+
+
+class _Entry:
+    __slots__ = ("config", "parent_config", "checkpoint", "metadata", "writes", "size")
+
+    def __init__(self, config, parent_config, checkpoint, metadata):
+        self.config = config
+        self.parent_config = parent_config
+        self.checkpoint = checkpoint  # (type, bytes)
+        self.metadata = metadata  # (type, bytes)
+        # (task_id, idx) -> (task_path, channel, (type, bytes))
+        self.writes: dict[tuple[str, int], tuple[str, str, tuple[str, bytes]]] = {}
+        self.size = ENTRY_OVERHEAD + len(checkpoint[1]) + len(metadata[1])
+
+
+class CachedCheckpointSaver(BaseCheckpointSaver):
+    """Write-through LRU cache of latest root checkpoints, keyed by thread_id."""
+
+    def __init__(self, inner: BaseCheckpointSaver, max_bytes: int = 64 * 1024 * 1024):
+        super().__init__(serde=inner.serde)
+        self.inner = inner
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "skipped_oversize": 0}
+
+    @staticmethod
+    def _key(config: RunnableConfig) -> Optional[str]:
+        """Cache key for root-namespace configs, None for subgraph namespaces."""
+        if config["configurable"].get("checkpoint_ns", ""):
+            return None
+        return str(config["configurable"]["thread_id"])
+
+    # --- Cache bookkeeping ---
+
+    def _store(self, key: str, entry: _Entry):
+        self._drop(key)
+        if entry.size > self.max_bytes // 4:
+            # A single huge thread would evict most of the cache
+            self._stats["skipped_oversize"] += 1
+            return
+        self._entries[key] = entry
+        self._bytes += entry.size
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= evicted.size
+            self._stats["evictions"] += 1
+
+    def _drop(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry.size
+
+    def _to_tuple(self, entry: _Entry) -> CheckpointTuple:
+        writes = sorted(entry.writes.items(), key=lambda item: writes_sort_key(item[1][0], item[0][0], item[0][1]))
+        return CheckpointTuple(
+            entry.config,
+            self.serde.loads_typed(entry.checkpoint),
+            self.serde.loads_typed(entry.metadata),
+            entry.parent_config,
+            [(task_id, channel, self.serde.loads_typed(value)) for (task_id, _), (_, channel, value) in writes],
+        )
+
+    def _from_tuple(self, item: CheckpointTuple) -> _Entry:
+        entry = _Entry(
+            item.config,
+            item.parent_config,
+            self.serde.dumps_typed(item.checkpoint),
+            self.serde.dumps_typed(item.metadata),
+        )
+        # Stored writes come back without task_path and idx, already in writes_sort_key order
+        per_task: dict[str, int] = {}
+        for task_id, channel, value in item.pending_writes or []:
+            idx = per_task[task_id] = per_task.get(task_id, -1) + 1
+            self._add_write(entry, task_id, idx, "", channel, self.serde.dumps_typed(value), overwrite=True)
+        return entry
+
+    def _add_write(self, entry: _Entry, task_id: str, idx: int, task_path: str, channel: str, value, overwrite: bool):
+        key = (task_id, idx)
+        if key in entry.writes:
+            if not overwrite:
+                return
+            entry.size -= len(entry.writes[key][2][1])
+        entry.writes[key] = (task_path, channel, value)
+        entry.size += len(value[1])
+
+    # --- Checkpointer interface ---
+
+    async def setup(self):
+        if hasattr(self.inner, "setup"):
+            await self.inner.setup()
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        key = self._key(config)
+        if key is None:
+            return await self.inner.aget_tuple(config)
+        entry = self._entries.get(key)
+        checkpoint_id = get_checkpoint_id(config)
+        if entry is not None and (not checkpoint_id or checkpoint_id == entry.config["configurable"]["checkpoint_id"]):
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return self._to_tuple(entry)
+
+        self._stats["misses"] += 1
+        item = await self.inner.aget_tuple(config)
+        # Only cache the latest checkpoint, and never over an entry a concurrent write just stored
+        if item is not None and not checkpoint_id and key not in self._entries:
+            self._store(key, self._from_tuple(item))
+        return item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        next_config = await self.inner.aput(config, checkpoint, metadata, new_versions)
+        key = self._key(next_config)
+        if key is None:
+            return next_config
+        parent_id = config["configurable"].get("checkpoint_id")
+        parent_config = (
+            {"configurable": {**next_config["configurable"], "checkpoint_id": parent_id}} if parent_id else None
+        )
+        self._store(key, _Entry(
+            next_config,
+            parent_config,
+            self.serde.dumps_typed(checkpoint),
+            self.serde.dumps_typed(get_checkpoint_metadata(config, metadata)),
+        ))
+        return next_config
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self.inner.aput_writes(config, writes, task_id, task_path)
+        key = self._key(config)
+        entry = self._entries.get(key) if key is not None else None
+        if entry is None:
+            return
+        if entry.config["configurable"]["checkpoint_id"] != config["configurable"].get("checkpoint_id"):
+            # Writes to an older checkpoint (e.g. replaying from history): let the next read reload
+            self._drop(key)
+            return
+        self._bytes -= entry.size
+        overwrite = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        for idx, (channel, value) in enumerate(writes):
+            self._add_write(
+                entry, task_id, WRITES_IDX_MAP.get(channel, idx), task_path, channel, self.serde.dumps_typed(value), overwrite
+            )
+        self._bytes += entry.size
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        self._drop(str(thread_id))
+        await self.inner.adelete_thread(thread_id)
+
+    async def alist(self, config: Optional[RunnableConfig], **kwargs) -> AsyncIterator[CheckpointTuple]:
+        async for item in self.inner.alist(config, **kwargs):
+            yield item
+
+    async def aget_delta_channel_history(self, *, config: RunnableConfig, channels: Sequence[str]):
+        return await self.inner.aget_delta_channel_history(config=config, channels=channels)
+
+    def get_next_version(self, current, channel):
+        return self.inner.get_next_version(current, channel)
+
+    def stats(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_rate": self._stats["hits"] / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+
+if __name__ == "__main__":
+    import asyncio
+    import os
+    import statistics
+    import tempfile
+    import time
+
+    from .checkpoint_benchmark import BACKENDS, sample_checkpoint
+
+    SESSIONS, TURNS = 20, 10
+
+    async def run(cached: bool) -> tuple[list, dict]:
+        latencies = []
+        with tempfile.TemporaryDirectory() as tmp:
+            async with BACKENDS["sqlite"](tmp) as saver:
+                await saver.setup()
+                if cached:
+                    saver = CachedCheckpointSaver(saver)
+                for turn in range(TURNS):
+                    for session in range(SESSIONS):
+                        root = {"configurable": {"thread_id": f"thread-{session}", "checkpoint_ns": ""}}
+                        # A turn: load state, write a checkpoint, read it back (aget_state), view history
+                        t = time.perf_counter()
+                        latest = await saver.aget_tuple(root)
+                        config = latest.config if latest else root
+                        config = await saver.aput(config, sample_checkpoint(turn), {"step": turn}, {})
+                        await saver.aput_writes(config, [("messages", "x")], task_id="task")
+                        await saver.aget_tuple(root)
+                        await saver.aget_tuple(root)
+                        latencies.append(time.perf_counter() - t)
+                stats = saver.stats() if cached else {}
+        return latencies, stats
+
+    async def main():
+        for cached in (False, True):
+            latencies, stats = await run(cached)
+            line = f"{'cached' if cached else 'uncached':>8}: p50 {statistics.median(latencies) * 1000:.2f} ms per turn"
+            if stats:
+                line += f" | hit rate {stats['hit_rate']:.0%} | {stats['entries']} entries, {stats['bytes'] / 1024:.0f} KB"
+            print(line)
+
+    asyncio.run(main())
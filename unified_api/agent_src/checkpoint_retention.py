@@ -0,0 +1,199 @@
+"""
+Retention for the SQLite checkpoint database.
+
+Every super-step of every turn leaves a checkpoint (plus its pending writes) in
+checkpoints.sqlite. Only the latest one per thread is needed to resume a session, so
+CheckpointRetention keeps the last `keep_last` root checkpoints of each thread (subgraph
+checkpoints newer than the oldest kept one are kept with them). Dropping whole threads whose
+latest checkpoint is older than `max_idle_seconds` is opt-in; by default no session expires.
+
+Threads are processed in small batches, each in its own short transaction under the
+saver's lock, so a pass never blocks chat turns for long. Deleted pages go on SQLite's
+freelist and are reused by later writes; run the CLI with --vacuum to shrink the file:
+
+    python -m agent_src.checkpoint_retention --db data/checkpoints.sqlite --keep 20 --vacuum
+"""
+import asyncio
+import os
+import time
+from typing import Optional
+
+import aiosqlite
+from langgraph.checkpoint.base.id import UUID
+
+# 100ns intervals between the UUID epoch (1582-10-15) and the Unix epoch
+_UUID_EPOCH_OFFSET = 0x01B21DD213814000
+
+
+def checkpoint_time(checkpoint_id: str) -> float:
+    """Unix time a checkpoint was created, decoded from its uuid6 id."""
+    return (UUID(checkpoint_id).time - _UUID_EPOCH_OFFSET) / 1e7
+
+
+class CheckpointRetention:
+    """
+    Prunes an AsyncSqliteSaver database. Pass the saver's connection and lock so
+    pruning is serialized with checkpoint reads and writes.
+    """
+
+    def __init__(
+        self,
+        conn: aiosqlite.Connection,
+        lock: Optional[asyncio.Lock] = None,
+        keep_last: int = 20,
+        max_idle_seconds: Optional[float] = 30 * 24 * 3600,
+        batch_threads: int = 50,
+        pause_seconds: float = 0.05,
+    ):
+        self.conn = conn
+        self.lock = lock or asyncio.Lock()
+        self.keep_last = max(1, keep_last)
+        self.max_idle_seconds = max_idle_seconds
+        self.batch_threads = batch_threads
+        self.pause_seconds = pause_seconds
+        self._stats = {
+            "passes": 0,
+            "checkpoints_deleted": 0,
+            "writes_deleted": 0,
+            "threads_dropped": 0,
+            "reclaimed_bytes": 0,
+            "last_pass_seconds": None,
+            "last_pass_at": None,
+        }
+
+    async def run_pass(self) -> dict:
+        """Prunes every thread once, batch by batch. Returns what this pass removed."""
+        started = time.perf_counter()
+        totals = {"checkpoints_deleted": 0, "writes_deleted": 0, "threads_dropped": 0, "reclaimed_bytes": 0}
+        cursor_thread = ""
+        while True:
+            async with self.conn.execute(
+                "SELECT DISTINCT thread_id FROM checkpoints "
+                "WHERE checkpoint_ns = '' AND thread_id > ? ORDER BY thread_id LIMIT ?",
+                (cursor_thread, self.batch_threads),
+            ) as cur:
+                threads = await cur.fetchall()
+            if not threads:
+                break
+            cursor_thread = threads[-1][0]
+
+            async with self.lock:
+                for (thread_id,) in threads:
+                    removed = await self._prune_thread(thread_id)
+                    for key, value in removed.items():
+                        totals[key] += value
+                await self.conn.commit()
+            # Let queued checkpoint writes through between batches
+            await asyncio.sleep(self.pause_seconds)
+
+        for key, value in totals.items():
+            self._stats[key] += value
+        self._stats["passes"] += 1
+        self._stats["last_pass_seconds"] = time.perf_counter() - started
+        self._stats["last_pass_at"] = time.time()
+        return totals
+
+    async def _prune_thread(self, thread_id: str) -> dict:
+        """Prunes one thread; called under the lock, so it can't race a turn writing to it."""
+        removed = {"checkpoints_deleted": 0, "writes_deleted": 0, "threads_dropped": 0, "reclaimed_bytes": 0}
+        # Re-read the latest checkpoint here rather than trusting the batch query, which ran
+        # outside the lock: the session may have resumed since
+        async with self.conn.execute(
+            "SELECT MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ''", (thread_id,)
+        ) as cur:
+            (latest_id,) = await cur.fetchone()
+        if latest_id is None:
+            return removed
+        if self.max_idle_seconds and time.time() - checkpoint_time(latest_id) > self.max_idle_seconds:
+            where, params = "thread_id = ?", (thread_id,)
+            removed["threads_dropped"] = 1
+        else:
+            async with self.conn.execute(
+                "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = '' "
+                "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+                (thread_id, self.keep_last - 1),
+            ) as cur:
+                row = await cur.fetchone()
+            if row is None:
+                return removed
+            # Checkpoint ids are uuid6, so they sort by creation time across namespaces
+            where, params = "thread_id = ? AND checkpoint_id < ?", (thread_id, row[0])
+
+        async with self.conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints WHERE {where}", params
+        ) as cur:
+            checkpoints, checkpoint_bytes = await cur.fetchone()
+        async with self.conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(LENGTH(value)), 0) FROM writes WHERE {where}", params
+        ) as cur:
+            writes, write_bytes = await cur.fetchone()
+        if checkpoints or writes:
+            await self.conn.execute(f"DELETE FROM checkpoints WHERE {where}", params)
+            await self.conn.execute(f"DELETE FROM writes WHERE {where}", params)
+        removed.update(
+            checkpoints_deleted=checkpoints,
+            writes_deleted=writes,
+            reclaimed_bytes=checkpoint_bytes + write_bytes,
+        )
+        return removed
+
+    async def run_forever(self, interval_seconds: float):
+        """Background loop for the app lifespan; cancel the task to stop it."""
+        while True:
+            try:
+                removed = await self.run_pass()
+                if removed["checkpoints_deleted"] or removed["writes_deleted"]:
+                    print(f"--- Checkpoint retention: removed {removed['checkpoints_deleted']} checkpoints, "
+                          f"{removed['writes_deleted']} writes, {removed['threads_dropped']} idle threads "
+                          f"({removed['reclaimed_bytes'] / 1024:.0f} KB) ---")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"--- Checkpoint retention pass failed: {e} ---")
+            await asyncio.sleep(interval_seconds)
+
+    async def free_bytes(self) -> int:
+        """Space on the freelist, reusable by new checkpoints without growing the file."""
+        async with self.conn.execute("PRAGMA freelist_count") as cur:
+            (pages,) = await cur.fetchone()
+        async with self.conn.execute("PRAGMA page_size") as cur:
+            (page_size,) = await cur.fetchone()
+        return pages * page_size
+
+    def stats(self) -> dict:
+        return dict(self._stats)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .config import CHECKPOINT_DB_PATH
+
+    parser = argparse.ArgumentParser(description="Prune and optionally VACUUM the checkpoint database.")
+    parser.add_argument("--db", default=CHECKPOINT_DB_PATH, help="path to the AsyncSqliteSaver database")
+    parser.add_argument("--keep", type=int, default=20, help="root checkpoints to keep per thread")
+    parser.add_argument("--max-idle-days", type=float, default=0,
+                        help="drop threads idle longer than this (0, the default, keeps them)")
+    parser.add_argument("--vacuum", action="store_true", help="rebuild the file afterwards to return freed space to the OS")
+    args = parser.parse_args()
+
+    async def main():
+        size_before = os.path.getsize(args.db)
+        async with aiosqlite.connect(args.db) as conn:
+            retention = CheckpointRetention(
+                conn,
+                keep_last=args.keep,
+                max_idle_seconds=args.max_idle_days * 24 * 3600 or None,
+                pause_seconds=0,
+            )
+            removed = await retention.run_pass()
+            print(f"Removed {removed['checkpoints_deleted']} checkpoints and {removed['writes_deleted']} writes "
+                  f"({removed['threads_dropped']} idle threads dropped), "
+                  f"{removed['reclaimed_bytes'] / 1024 / 1024:.1f} MB of checkpoint data")
+            print(f"Free pages: {await retention.free_bytes() / 1024 / 1024:.1f} MB")
+            if args.vacuum:
+                await conn.execute("VACUUM")
+        size_after = os.path.getsize(args.db)
+        print(f"File size: {size_before / 1024 / 1024:.1f} MB -> {size_after / 1024 / 1024:.1f} MB")
+
+    asyncio.run(main())
@@ -0,0 +1,178 @@
+"""
+Compact serializer for checkpointed agent state.
+
+Wraps LangGraph's JsonPlusSerializer (msgpack) with two steps:
+
+- Plain chat messages (only content, type and id set, which is all the nodes ever
+  create) are stored as a small [type, content, id] record instead of the full pydantic
+  dump with its empty kwargs/metadata/tool-call fields, about 150 bytes saved each.
+- Payloads of at least `threshold` bytes (strategy guides, long message lists) are
+  compressed with zstd when the zstandard package is installed, zlib otherwise.
+
+The steps are recorded in the type tag stored next to each blob ("msgpack+compact+zstd"),
+so checkpoints written by the stock serializer ("msgpack") still load unchanged.
+
+Run `python -m agent_src.checkpoint_serde` from unified_api/ for bytes per checkpoint
+and encode/decode times on a typical funnel state.
+"""
+import zlib
+from typing import Any, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MESSAGE_KEY = "__msg__"
+MESSAGE_TYPES = {"human": HumanMessage, "ai": AIMessage, "system": SystemMessage}
+COMPACT_FIELDS = {"content", "type", "id"}
+
+
+def _is_plain(message: BaseMessage) -> bool:
+    return (
+        type(message) is MESSAGE_TYPES.get(message.type)
+        and isinstance(message.content, str)
+        and set(message.model_dump(exclude_defaults=True)) <= COMPACT_FIELDS
+    )
+
+
+def _pack(value: Any) -> Any:
+    if isinstance(value, BaseMessage) and _is_plain(value):
+        return {MESSAGE_KEY: [value.type, value.content, value.id]}
+    if isinstance(value, dict):
+        return {k: _pack(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_pack(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_pack(v) for v in value)
+    return value
+
+
+def _unpack(value: Any) -> Any:
+    if isinstance(value, dict):
+        if len(value) == 1 and MESSAGE_KEY in value:
+            msg_type, content, msg_id = value[MESSAGE_KEY]
+            return MESSAGE_TYPES[msg_type](content=content, id=msg_id)
+        return {k: _unpack(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_unpack(v) for v in value]
+    if isinstance(value, tuple):
+        return tuple(_unpack(v) for v in value)
+    return value
+
+
+class CompactSerializer:
+    """SerializerProtocol implementation; pass as `serde=` to a checkpointer."""
+
+    def __init__(self, threshold: int = 1024, codec: str = "zstd", level: Optional[int] = None):
+        self.inner = JsonPlusSerializer()
+        self.threshold = threshold
+        self.codec = codec if codec != "zstd" or zstandard is not None else "zlib"
+        self.level = level if level is not None else (3 if self.codec == "zstd" else 6)
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        type_, data = self.inner.dumps_typed(_pack(obj))
+        if type_ != "msgpack":
+            return type_, data
+        type_ += "+compact"
+        if len(data) >= self.threshold:
+            if self.codec == "zstd":
+                data = zstandard.compress(data, self.level)
+            else:
+                data = zlib.compress(data, self.level)
+            type_ += f"+{self.codec}"
+        return type_, data
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        type_, payload = data
+        base, *steps = type_.split("+")
+        if not steps:
+            # Written by the stock serializer
+            return self.inner.loads_typed(data)
+        if "zstd" in steps:
+            if zstandard is None:
+                raise RuntimeError("Checkpoint is zstd-compressed but the zstandard package is not installed")
+            payload = zstandard.decompress(payload)
+        elif "zlib" in steps:
+            payload = zlib.decompress(payload)
+        value = self.inner.loads_typed((base, payload))
+        return _unpack(value) if "compact" in steps else value
+
+
+def make_serializer() -> Optional[CompactSerializer]:
+    """The configured checkpoint serializer, or None for the checkpointer's default."""
+    from .config import CHECKPOINT_COMPACT_SERDE, CHECKPOINT_COMPRESS_THRESHOLD, CHECKPOINT_COMPRESSION
+
+    if not CHECKPOINT_COMPACT_SERDE:
+        return None
+    return CompactSerializer(threshold=CHECKPOINT_COMPRESS_THRESHOLD, codec=CHECKPOINT_COMPRESSION)
+
+
+if __name__ == "__main__":
+    import time
+
+    from langgraph.checkpoint.base import empty_checkpoint
+
+    from .transcript import MESSAGE_WINDOW
+
+    GUIDE = """### Step-by-step guide: Partner with running clubs
+
+**1. Shortlist clubs (week 1).** Search Strava, Meetup and local Facebook groups for running clubs within 30 miles. Rank them by member count and how often they post.
+**2. Prepare the offer (week 1).** Give club members a 3-month premium trial and the club a shared leaderboard. Create one promo code per club so signups can be attributed.
+**3. Reach out (week 2).** Email organizers with a short pitch, a 60-second demo video and a one-page PDF. Follow up after four days; offer to sponsor water or bibs at their next group run.
+**4. Show up (weeks 3-4).** Attend a group run, bring branded stickers, and help members install the app on the spot. Take photos (with permission) for social posts.
+**5. Activate (weeks 4-6).** Launch a club-vs-club distance challenge inside the app with weekly updates. Feature the top runners on Instagram and in your newsletter.
+**6. Measure (week 6).** Track installs and trial-to-paid conversion per promo code. Double down on the clubs converting above 15% and drop the rest.
+
+**Budget:** roughly $400 for stickers, sponsorships and promoted posts.
+**Tools:** Canva for the PDF, Bitly or UTM links, Google Sheets for tracking.
+**Tip:** Ask organizers for a testimonial quote you can reuse on your landing page."""
+    STRATEGIES = [
+        "Partner with local running clubs to offer members free premium trials.",
+        "Run an Instagram Reels series showing real users' training progress.",
+        "Launch a referral program that unlocks premium features for both runners.",
+        "Sponsor virtual 5K races and feature the app's live tracking.",
+        "Collaborate with fitness micro-influencers for honest app reviews.",
+    ]
+
+    def funnel_checkpoint():
+        messages = []
+        for turn in range(MESSAGE_WINDOW // 2):
+            messages.append(HumanMessage(content=f"Here is more about my app, turn {turn}.", id=f"h{turn}"))
+            messages.append(AIMessage(content=GUIDE if turn % 3 == 0 else "Great, tell me more about your goals!", id=f"a{turn}"))
+        checkpoint = empty_checkpoint()
+        checkpoint["channel_values"] = {
+            "messages": messages,
+            "product_details": "Name: FitTrack\nFeatures: step counting\nTarget Audience: runners\nGoals: downloads",
+            "strategies": STRATEGIES,
+            "selected_strategy": STRATEGIES[0],
+            "strategy_guide": GUIDE,
+        }
+        return checkpoint
+
+    def measure(name, serde, checkpoint, rounds=500):
+        t = time.perf_counter()
+        for _ in range(rounds):
+            blob = serde.dumps_typed(checkpoint)
+        encode = (time.perf_counter() - t) / rounds
+        t = time.perf_counter()
+        for _ in range(rounds):
+            serde.loads_typed(blob)
+        decode = (time.perf_counter() - t) / rounds
+        print(f"{name:>22}: {len(blob[1]):>7} bytes | encode {encode * 1e6:>7.0f} us | decode {decode * 1e6:>7.0f} us")
+
+    checkpoint = funnel_checkpoint()
+    print(f"Funnel checkpoint with {MESSAGE_WINDOW} messages, a {len(GUIDE)}-char guide and {len(STRATEGIES)} strategies")
+    measure("JsonPlusSerializer", JsonPlusSerializer(), checkpoint)
+    measure("compact", CompactSerializer(threshold=1 << 30), checkpoint)
+    measure("compact + zlib", CompactSerializer(codec="zlib"), checkpoint)
+    if zstandard is not None:
+        measure("compact + zstd", CompactSerializer(codec="zstd"), checkpoint)
+
+    serde = CompactSerializer()
+    assert serde.loads_typed(serde.dumps_typed(checkpoint)) == JsonPlusSerializer().loads_typed(JsonPlusSerializer().dumps_typed(checkpoint))
+    assert serde.loads_typed(JsonPlusSerializer().dumps_typed(checkpoint))["channel_values"]["messages"] == checkpoint["channel_values"]["messages"]
+    print("Round trip and stock-format reads OK")
@@ -0,0 +1,84 @@
+"""
+Opens the checkpointer selected by CHECKPOINTER_BACKEND for the app lifespan.
+
+    async with open_checkpointer() as checkpointer:
+        graph_app = compile_workflow(checkpointer)
+
+"sqlite" (default), "sqlite_tuned" and "sharded" keep sessions in local SQLite files;
+"redis" keeps them on a Redis server so several API workers can share them.
+"""
+import os
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import aiosqlite
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from .checkpoint_serde import make_serializer
+from .redis_checkpointer import AsyncRedisCheckpointSaver, create_pool
+from .sharded_checkpointer import ShardedSaver
+from .sqlite_checkpointer import TunedSqliteSaver
+from .config import (
+    CHECKPOINT_DB_PATH,
+    CHECKPOINTER_BACKEND,
+    CHECKPOINT_READERS,
+    CHECKPOINT_WRITE_BATCH,
+    CHECKPOINT_SHARDS,
+    CHECKPOINT_SHARD_PATTERN,
+    CHECKPOINT_REDIS_PREFIX,
+    CHECKPOINT_REDIS_TTL,
+    CHECKPOINT_KEEP_LAST,
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_DB,
+    REDIS_PASSWORD,
+    REDIS_POOL_SIZE,
+    REDIS_POOL_TIMEOUT,
+    REDIS_SOCKET_TIMEOUT,
+    REDIS_CONNECT_TIMEOUT,
+)
+
+BACKENDS = ("sqlite", "sqlite_tuned", "sharded", "redis")
+
+
+@asynccontextmanager
+async def open_sqlite_saver(path, serde):
+    # AsyncSqliteSaver.from_conn_string doesn't take a serializer
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    async with aiosqlite.connect(path) as conn:
+        yield AsyncSqliteSaver(conn, serde=serde)
+
+
+def open_checkpointer(backend: Optional[str] = None):
+    """Async context manager yielding the configured checkpointer."""
+    backend = backend or CHECKPOINTER_BACKEND
+    serde = make_serializer()
+    if backend == "sqlite_tuned":
+        return TunedSqliteSaver.from_path(
+            CHECKPOINT_DB_PATH, readers=CHECKPOINT_READERS, max_batch=CHECKPOINT_WRITE_BATCH, serde=serde
+        )
+    if backend == "sharded":
+        return ShardedSaver.from_pattern(
+            CHECKPOINT_SHARD_PATTERN, CHECKPOINT_SHARDS, readers=CHECKPOINT_READERS, max_batch=CHECKPOINT_WRITE_BATCH, serde=serde
+        )
+    if backend == "redis":
+        pool = create_pool(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            db=REDIS_DB,
+            password=REDIS_PASSWORD,
+            max_connections=REDIS_POOL_SIZE,
+            pool_timeout=REDIS_POOL_TIMEOUT,
+            socket_timeout=REDIS_SOCKET_TIMEOUT,
+            connect_timeout=REDIS_CONNECT_TIMEOUT,
+        )
+        return AsyncRedisCheckpointSaver.from_pool(
+            pool,
+            prefix=CHECKPOINT_REDIS_PREFIX,
+            ttl_seconds=CHECKPOINT_REDIS_TTL,
+            keep_last=CHECKPOINT_KEEP_LAST,
+            serde=serde,
+        )
+    if backend != "sqlite":
+        raise ValueError(f"Unknown CHECKPOINTER_BACKEND {backend!r}; expected one of {', '.join(BACKENDS)}")
+    return open_sqlite_saver(CHECKPOINT_DB_PATH, serde)
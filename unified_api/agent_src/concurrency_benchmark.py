@@ -0,0 +1,145 @@
+"""
+Concurrency check for chat turns.
+
+Replaces the Groq models and search_web with fakes that wait a fixed latency
+without blocking (like the real network calls do once the nodes are async), then runs
+each session's first two turns (product details, then "yes" to get strategies) through
+run_turn, the same path /api/agent/chat takes. N sessions in parallel should take about
+as long as one; a node that blocks the event loop pushes that towards N times as long.
+
+    python -m agent_src.concurrency_benchmark
+    python -m agent_src.concurrency_benchmark --sessions 50 --latency 0.2
+
+Needs no API key or network access.
+"""
+import asyncio
+import contextlib
+import io
+import os
+import tempfile
+import time
+import uuid
+from typing import Any
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import InMemorySaver
+
+# Fixed reply per prompt, matched on a phrase of its system message
+FAKE_REPLIES = {
+    "intelligent router": "marketing",
+    "extracting product details": (
+        "Name: FitTrack\nFeatures: step counting, sleep tracking\nTarget Audience: amateur runners\nGoals: grow app downloads"
+    ),
+    "generate 3-5 concise": (
+        "1. Partner with running clubs for group challenges. (Source: [1])\n"
+        "2. Run an Instagram campaign with runner testimonials. (Source: [2])\n"
+        "3. Offer a referral reward for inviting friends. (Source: [3])"
+    ),
+}
+PRODUCT_MESSAGE = "We built FitTrack, a step counting and sleep tracking app for amateur runners, and want more downloads"
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers from FAKE_REPLIES after `latency` seconds of non-blocking waiting."""
+
+    latency: float = 0.2
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-fixed-latency"
+
+    def _reply(self, messages: list[BaseMessage]) -> str:
+        prompt = " ".join(str(m.content) for m in messages)
+        return next((reply for phrase, reply in FAKE_REPLIES.items() if phrase in prompt), "Hi! Need marketing help?")
+
+    def _generate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        raise RuntimeError("the chat nodes should only call the model asynchronously")
+
+    async def _agenerate(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._reply(messages)))])
+
+    def with_structured_output(self, schema, **kwargs: Any):
+        async def extract(_):
+            self.calls += 1
+            await asyncio.sleep(self.latency)
+            return schema(
+                name="FitTrack",
+                features="step counting, sleep tracking",
+                target_audience="amateur runners",
+                goals="grow app downloads",
+            )
+
+        return RunnableLambda(extract)
+
+
+async def fake_search_web(query: str, max_results: int, latency: float = 0.2) -> list[dict]:
+    await asyncio.sleep(latency)
+    return [
+        {"title": f"Result {i}", "snippet": f"Marketing idea {i} for {query}", "link": f"https://example.com/{i}"}
+        for i in range(1, max_results + 1)
+    ]
+
+
+async def run_sessions(graph_app, sessions: int) -> float:
+    """Runs `sessions` two-turn conversations concurrently; returns the wall time in seconds."""
+    from .chat_turn import run_turn
+
+    async def session():
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
+        first = await run_turn(graph_app, {"messages": [HumanMessage(content=PRODUCT_MESSAGE)]}, config)
+        assert first.values.get("product_details"), first.response
+        second = await run_turn(graph_app, {"messages": [HumanMessage(content="yes")]}, config)
+        assert len(second.values.get("strategies") or []) == 3, second.response
+
+    t = time.perf_counter()
+    await asyncio.gather(*(session() for _ in range(sessions)))
+    return time.perf_counter() - t
+
+
+async def check_concurrency(sessions: int, latency: float) -> dict:
+    """Single-session vs `sessions`-way wall time with the LLM and search stubbed out."""
+    # The nodes build their ChatGroq clients at import time, which needs some key
+    os.environ.setdefault("GROQ_API_KEY", "stub")
+    from .marketing_agent import marketing_nodes
+    from .orchestrator import orchestrator_nodes, orchestrator_graph
+    from .transcript import TranscriptStore
+
+    model = FakeChatModel(latency=latency)
+    marketing_nodes.llm = model
+    orchestrator_nodes.llm = model
+    marketing_nodes.search_web = lambda query, max_results: fake_search_web(query, max_results, latency)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        orchestrator_graph.transcript_store = TranscriptStore(os.path.join(tmp, "transcripts.sqlite"))
+        graph_app = orchestrator_graph.compile_workflow(InMemorySaver())
+        # The nodes log every step; keep the report readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            await run_sessions(graph_app, 1)  # warm-up: imports, compiled prompts, SQLite setup
+            single = await run_sessions(graph_app, 1)
+            model.calls = 0
+            concurrent = await run_sessions(graph_app, sessions)
+        await orchestrator_graph.transcript_store.close()
+    return {"single": single, "concurrent": concurrent, "llm_calls": model.calls}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Check that concurrent chat turns overlap instead of queueing.")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds each fake LLM call / search takes")
+    args = parser.parse_args()
+
+    result = asyncio.run(check_concurrency(args.sessions, args.latency))
+    serial = result["single"] * args.sessions
+    print(f"1 session: {result['single']:.2f}s | {args.sessions} concurrent sessions: {result['concurrent']:.2f}s "
+          f"({result['llm_calls']} LLM calls; {serial:.2f}s if they ran one after another)")
+    # Generous bound: overlapping sessions stay close to one session's time, serialized ones reach N times it
+    assert result["concurrent"] < serial / 4, "concurrent turns did not overlap; something blocks the event loop"
+    print("Concurrent turns overlap OK")
@@ -8,18 +8,176 @@ load_dotenv()
 # --- LLM Configuration ---
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
+# --- Data Directory Configuration ---
+# SQLite files (caches, transcripts, checkpoints) default to this directory instead of the
+# working directory; each *_PATH variable below can still point anywhere
+DATA_DIR = os.getenv("DATA_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data"))
+
+
+def _data_path(name: str) -> str:
+    # Only builds the path: each store creates its file's directory when it first opens it,
+    # so DATA_DIR appears only once a default path is actually used
+    return os.path.join(DATA_DIR, name)
+
+# --- Streaming Configuration ---
+# LLM runs tagged with this are forwarded token-by-token to /api/agent/chat/stream.
+# Internal calls (routing, query generation, classification) are left untagged.
+STREAM_TAG = "user_stream"
+
+# --- Parallel Execution Configuration ---
+# Per-branch timeout (seconds) for searches/LLM calls that nodes run concurrently
+BRANCH_TIMEOUT = float(os.getenv("BRANCH_TIMEOUT", 20))
+
+# --- Sticky Routing Configuration ---
+# Sessions in the middle of the marketing funnel skip the router for this long (seconds) after their last turn
+STICKY_ROUTING_TIMEOUT = int(os.getenv("STICKY_ROUTING_TIMEOUT", 30 * 60))
+
+# --- Chat Concurrency Configuration ---
+# Turns allowed to wait behind a running turn of the same session (see single_flight.py)
+SESSION_MAX_QUEUED = int(os.getenv("SESSION_MAX_QUEUED", 4))
+# How long /api/agent/chat results are replayed for a repeated Idempotency-Key, and how many are kept
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", 600))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", 10000))
+
+# --- Speculative Guide Prefetch Configuration ---
+# Build guides for every listed strategy in the background while the user picks one
+GUIDE_PREFETCH_ENABLED = os.getenv("GUIDE_PREFETCH_ENABLED", "false").lower() in ("true", "1", "t")
+GUIDE_PREFETCH_MAX_THREADS = int(os.getenv("GUIDE_PREFETCH_MAX_THREADS", 100))
+GUIDE_PREFETCH_CONCURRENCY = int(os.getenv("GUIDE_PREFETCH_CONCURRENCY", 4))
+
+# --- Speculative Strategy Generation Configuration ---
+# Start generating strategies in the background as soon as product details are confirmed
+STRATEGY_SPECULATION_ENABLED = os.getenv("STRATEGY_SPECULATION_ENABLED", "false").lower() in ("true", "1", "t")
+STRATEGY_SPECULATION_MAX_THREADS = int(os.getenv("STRATEGY_SPECULATION_MAX_THREADS", 100))
+STRATEGY_SPECULATION_CONCURRENCY = int(os.getenv("STRATEGY_SPECULATION_CONCURRENCY", 4))
+
+# --- Web Search Cache Configuration ---
+SEARCH_CACHE_ENABLED = os.getenv("SEARCH_CACHE_ENABLED", "true").lower() in ("true", "1", "t")
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH") or _data_path("search_cache.sqlite")
+SEARCH_CACHE_TTL = int(os.getenv("SEARCH_CACHE_TTL", 24 * 3600))
+SEARCH_CACHE_MEMORY_ENTRIES = int(os.getenv("SEARCH_CACHE_MEMORY_ENTRIES", 256))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", 50 * 1024 * 1024))
+
+# --- LLM Response Cache Configuration ---
+# Opt-in exact-match cache for deterministic chains (query generation, routing, selection)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "false").lower() in ("true", "1", "t")
+LLM_CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory").lower()  # "memory" or "sqlite"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH") or _data_path("llm_cache.sqlite")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", 5000))
+# Per-chain TTLs in seconds, overridable with e.g. LLM_CACHE_TTL_ROUTER=600
+LLM_CACHE_TTLS = {
+    name: int(os.getenv(f"LLM_CACHE_TTL_{name.upper()}", ttl))
+    for name, ttl in {
+        "strategy_query_generation": 24 * 3600,
+        "guide_query_generation": 24 * 3600,
+        "router": 3600,
+        "strategy_selection": 3600,
+    }.items()
+}
+
+# --- Conversation Context Configuration ---
+# Token budgets for what each node sends to the LLM; history beyond the budget is
+# folded into a rolling summary kept in state. Overridable with e.g. CONTEXT_TOKENS_GATHER_PRODUCT=800
+CONTEXT_POLICIES = {
+    "gather_product": {
+        "history_tokens": int(os.getenv("CONTEXT_TOKENS_GATHER_PRODUCT", 1200)),
+        "min_recent": 2,
+    },
+    "router": {
+        "message_tokens": int(os.getenv("CONTEXT_TOKENS_ROUTER", 150)),
+    },
+    "check_satisfaction": {
+        "guide_tokens": int(os.getenv("CONTEXT_TOKENS_CHECK_SATISFACTION", 500)),
+    },
+}
+# Number of messages that must fall out of the window before the summary is refreshed
+CONTEXT_SUMMARY_BATCH = int(os.getenv("CONTEXT_SUMMARY_BATCH", 4))
+
+# --- Message History Configuration ---
+# Checkpointed state keeps only the most recent messages; the full conversation
+# is archived to the transcript store (see transcript.py)
+MESSAGE_WINDOW = int(os.getenv("MESSAGE_WINDOW", 20))
+TRANSCRIPT_DB_PATH = os.getenv("TRANSCRIPT_DB_PATH") or _data_path("transcripts.sqlite")
+# Key prefix of the transcript store when CHECKPOINTER_BACKEND=redis (TRANSCRIPT_DB_PATH is unused then)
+TRANSCRIPT_REDIS_PREFIX = os.getenv("TRANSCRIPT_REDIS_PREFIX", "transcript")
+# Default and maximum page size for /api/agent/history when paging (a request with no cursor
+# and no limit gets the whole conversation)
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 50))
+HISTORY_MAX_PAGE_SIZE = int(os.getenv("HISTORY_MAX_PAGE_SIZE", 200))
+
+# --- Checkpoint Database Configuration ---
+# Earlier releases kept the checkpoints in ./checkpoints.sqlite; an existing file there is still
+# used so upgrading does not lose saved sessions (move it into DATA_DIR to switch)
+_LEGACY_CHECKPOINT_DB_PATH = "checkpoints.sqlite"
+if os.getenv("CHECKPOINT_DB_PATH"):
+    CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH")
+elif os.path.exists(_LEGACY_CHECKPOINT_DB_PATH):
+    CHECKPOINT_DB_PATH = _LEGACY_CHECKPOINT_DB_PATH
+    print(
+        f"--- NOTE: using legacy checkpoint database {os.path.abspath(_LEGACY_CHECKPOINT_DB_PATH)}; "
+        f"move it to {os.path.join(DATA_DIR, 'checkpoints.sqlite')} or set CHECKPOINT_DB_PATH. ---"
+    )
+else:
+    CHECKPOINT_DB_PATH = _data_path("checkpoints.sqlite")
+# "sqlite": stock AsyncSqliteSaver; "sqlite_tuned": WAL/pragmas, batched writer and reader pool (see sqlite_checkpointer.py);
+# "sharded": tuned savers over CHECKPOINT_SHARDS files, by thread_id (see sharded_checkpointer.py);
+# "redis": async Redis saver on a shared connection pool (see redis_checkpointer.py and the Redis settings below)
+CHECKPOINTER_BACKEND = os.getenv("CHECKPOINTER_BACKEND", "sqlite").lower()
+CHECKPOINT_READERS = int(os.getenv("CHECKPOINT_READERS", 4))
+CHECKPOINT_WRITE_BATCH = int(os.getenv("CHECKPOINT_WRITE_BATCH", 256))
+CHECKPOINT_SHARDS = int(os.getenv("CHECKPOINT_SHARDS", 4))
+CHECKPOINT_SHARD_PATTERN = os.getenv("CHECKPOINT_SHARD_PATTERN") or _data_path("checkpoints.shard{}.sqlite")
+# Per-process write-through LRU cache of each thread's latest checkpoint (see checkpoint_cache.py).
+# Off by default for Redis, where other workers may write the same sessions.
+CHECKPOINT_CACHE_ENABLED = os.getenv(
+    "CHECKPOINT_CACHE_ENABLED", "false" if CHECKPOINTER_BACKEND == "redis" else "true"
+).lower() in ("true", "1", "t")
+CHECKPOINT_CACHE_MB = int(os.getenv("CHECKPOINT_CACHE_MB", 64))
+# Compact message encoding plus compression of large checkpoints (see checkpoint_serde.py).
+# Checkpoints written without it are still readable with it, but not the other way round.
+CHECKPOINT_COMPACT_SERDE = os.getenv("CHECKPOINT_COMPACT_SERDE", "true").lower() in ("true", "1", "t")
+CHECKPOINT_COMPRESS_THRESHOLD = int(os.getenv("CHECKPOINT_COMPRESS_THRESHOLD", 1024))
+# "zstd" (falls back to zlib when the zstandard package is not installed) or "zlib"
+CHECKPOINT_COMPRESSION = os.getenv("CHECKPOINT_COMPRESSION", "zstd").lower()
+
+# --- Checkpoint Retention Configuration ---
+# Background pruning of old checkpoints (see checkpoint_retention.py)
+CHECKPOINT_RETENTION_ENABLED = os.getenv("CHECKPOINT_RETENTION_ENABLED", "true").lower() in ("true", "1", "t")
+# Checkpoints kept per thread namespace; the Redis backend trims to this on write
+CHECKPOINT_KEEP_LAST = int(os.getenv("CHECKPOINT_KEEP_LAST", 20))
+# Opt-in: threads idle longer than this are deleted entirely; 0 (the default) never expires a session
+CHECKPOINT_MAX_IDLE_DAYS = float(os.getenv("CHECKPOINT_MAX_IDLE_DAYS", 0))
+CHECKPOINT_RETENTION_INTERVAL = int(os.getenv("CHECKPOINT_RETENTION_INTERVAL", 600))
+CHECKPOINT_RETENTION_BATCH = int(os.getenv("CHECKPOINT_RETENTION_BATCH", 50))
+
 # --- Checkpointer Configuration ---
 # Use Redis if USE_REDIS is set to true, otherwise use in-memory
 USE_REDIS = os.getenv("USE_REDIS", "false").lower() in ("true", "1", "t")
 
+# Redis Configuration
+REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
+
+# Async pool used when CHECKPOINTER_BACKEND=redis. Requests wait up to REDIS_POOL_TIMEOUT
+# seconds for a free connection once all REDIS_POOL_SIZE are in use.
+REDIS_POOL_SIZE = int(os.getenv("REDIS_POOL_SIZE", 20))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 5))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", 2))
+CHECKPOINT_REDIS_PREFIX = os.getenv("CHECKPOINT_REDIS_PREFIX", "checkpoint")
+# Seconds a session's checkpoints live after its last write; 0 keeps them forever
+CHECKPOINT_REDIS_TTL = int(os.getenv("CHECKPOINT_REDIS_TTL", 30 * 24 * 3600))
+
+# Bounds for the in-memory fallback used when Redis is off (see bounded_memory_saver.py);
+# least recently used threads beyond them are moved to MEMORY_SAVER_SPILL_PATH
+MEMORY_SAVER_MAX_THREADS = int(os.getenv("MEMORY_SAVER_MAX_THREADS", 1000))
+MEMORY_SAVER_MAX_MB = int(os.getenv("MEMORY_SAVER_MAX_MB", 128))
+MEMORY_SAVER_SPILL_PATH = os.getenv("MEMORY_SAVER_SPILL_PATH") or _data_path("checkpoint_spill.sqlite")
+
 redis_client = None
 if USE_REDIS:
-    # Redis Configuration
-    REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-    REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
-    REDIS_DB = int(os.getenv("REDIS_DB", 0))
-    REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
-
     try:
         # Create a Redis client instance to be shared
         redis_client = redis.Redis(
@@ -0,0 +1,116 @@
+from collections import defaultdict
+from typing import Optional, Sequence
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import BaseMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+
+from .config import CONTEXT_POLICIES, CONTEXT_SUMMARY_BATCH
+
+
+def count_tokens(text: str) -> int:
+    """
+    Approximate token count (~4 characters per token for English with the Llama
+    tokenizers). Cheap enough to run on every prompt; budgets leave headroom for the error.
+    """
+    return (len(text) + 3) // 4 if text else 0
+
+
+def message_tokens(message: BaseMessage) -> int:
+    content = message.content if isinstance(message.content, str) else str(message.content)
+    # A few tokens of per-message overhead for the role/formatting
+    return count_tokens(content) + 4
+
+
+def truncate_to_tokens(text: Optional[str], max_tokens: int) -> str:
+    """Cuts text to roughly max_tokens, on a line or word boundary where possible."""
+    if not text or count_tokens(text) <= max_tokens:
+        return text or ""
+    cut = text[: max_tokens * 4]
+    boundary = max(cut.rfind('\n'), cut.rfind(' '))
+    if boundary > len(cut) // 2:
+        cut = cut[:boundary]
+    return cut.rstrip() + " …"
+
+
+async def bounded_history(node: str, state: dict, llm) -> tuple[list[BaseMessage], dict]:
+    """
+    Applies the node's context policy to the conversation history.
+
+    Keeps the most recent messages that fit in the policy's `history_tokens` budget
+    (always at least `min_recent`). Older messages are folded into a rolling summary
+    stored in state (`context_summary`, covering everything up to the message with id
+    `context_summary_upto`), which is prepended as a system message. The summary is only refreshed
+    once CONTEXT_SUMMARY_BATCH messages have fallen out of the window, so most turns
+    don't pay for a summarization call.
+
+    Returns the messages to send and the state update to merge into the node's result.
+    """
+    policy = CONTEXT_POLICIES[node]
+    messages = list(state.get("messages") or [])
+    summary = state.get("context_summary")
+    # Index just past the last summarized message; 0 if it has already left the message window
+    summary_upto_id = state.get("context_summary_upto")
+    summary_upto = next((i + 1 for i, msg in enumerate(messages) if msg.id == summary_upto_id), 0)
+
+    # Walk back from the newest message until the budget is spent
+    cut = len(messages)
+    used = 0
+    while cut > 0:
+        tokens = message_tokens(messages[cut - 1])
+        if used + tokens > policy["history_tokens"] and len(messages) - cut >= policy["min_recent"]:
+            break
+        used += tokens
+        cut -= 1
+
+    update = {}
+    unsummarized = messages[summary_upto:cut]
+    if len(unsummarized) >= CONTEXT_SUMMARY_BATCH:
+        summary = await summarize_messages(llm, summary, unsummarized)
+        summary_upto = cut
+        update = {"context_summary": summary, "context_summary_upto": messages[cut - 1].id}
+
+    # Messages covered by the summary are dropped; older ones not yet summarized stay verbatim
+    window = messages[summary_upto:]
+    if summary:
+        window = [SystemMessage(content=f"Summary of the earlier conversation: {summary}")] + window
+    return window, update
+
+
+async def summarize_messages(llm, summary: Optional[str], messages: Sequence[BaseMessage]) -> str:
+    """Folds older messages into the rolling summary."""
+    transcript = "\n".join(f"{msg.type}: {truncate_to_tokens(str(msg.content), 300)}" for msg in messages)
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "You maintain a running summary of a conversation between a user and a marketing assistant. Update the summary with the new messages. Keep every concrete fact about the user's product, audience, goals and decisions. Output ONLY the updated summary, at most 150 words."),
+        ("human", "Current summary:\n{summary}\n\nNew messages:\n{transcript}"),
+    ])
+    chain = prompt | llm | StrOutputParser()
+    print(f"--- Summarizing {len(messages)} older messages ---")
+    return (await chain.ainvoke({"summary": summary or "(none)", "transcript": transcript})).strip()
+
+
+class PromptTokenCounter(BaseCallbackHandler):
+    """Records estimated prompt tokens per graph node for every chat model call."""
+
+    run_inline = True
+
+    def __init__(self):
+        self._stats = defaultdict(lambda: {"calls": 0, "total_tokens": 0, "max_tokens": 0})
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, tags=None, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node", "background")
+        tokens = sum(message_tokens(m) for batch in messages for m in batch)
+        stats = self._stats[node]
+        stats["calls"] += 1
+        stats["total_tokens"] += tokens
+        stats["max_tokens"] = max(stats["max_tokens"], tokens)
+
+    def stats(self) -> dict:
+        return {
+            node: {**s, "avg_tokens": s["total_tokens"] / s["calls"] if s["calls"] else 0}
+            for node, s in self._stats.items()
+        }
+
+
+prompt_token_counter = PromptTokenCounter()
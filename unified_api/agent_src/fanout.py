@@ -0,0 +1,25 @@
+import asyncio
+from typing import Any, Awaitable, Optional
+
+from .config import BRANCH_TIMEOUT
+
+
+async def _run_branch(name: str, branch: Awaitable, timeout: float) -> Optional[Any]:
+    try:
+        return await asyncio.wait_for(branch, timeout)
+    except asyncio.TimeoutError:
+        print(f"--- Branch '{name}' timed out after {timeout}s ---")
+    except Exception as e:
+        print(f"--- Branch '{name}' failed: {e} ---")
+    return None
+
+
+async def run_branches(branches: dict[str, Awaitable], timeout: float = BRANCH_TIMEOUT) -> dict[str, Any]:
+    """
+    Fan-out/fan-in: starts independent searches and LLM calls at the same time and joins them.
+    Each branch gets its own timeout; a branch that fails or times out yields None
+    so the caller can degrade instead of failing the whole turn.
+    """
+    names = list(branches)
+    results = await asyncio.gather(*(_run_branch(name, branches[name], timeout) for name in names))
+    return dict(zip(names, results))
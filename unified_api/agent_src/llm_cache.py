@@ -0,0 +1,188 @@
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Optional
+
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
+
+from .config import (
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_BACKEND,
+    LLM_CACHE_PATH,
+    LLM_CACHE_MAX_ENTRIES,
+    LLM_CACHE_TTLS,
+)
+
+
+class MemoryResponseStore:
+    """In-process LRU store of cached LLM responses."""
+
+    # Cheap enough to call on the event loop
+    blocking = False
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if not entry:
+                return None
+            value, expires_at = entry
+            if time.time() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int):
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SqliteResponseStore:
+    """
+    SQLite-backed LRU store, shared across restarts and workers on the same host.
+    Reads only write when a row's accessed_at is more than `touch_interval` seconds old,
+    so a hot entry costs one commit per interval rather than one per hit; expired rows
+    are left for the next set() to delete.
+    """
+
+    # Does disk I/O: LLMResponseCache calls it from a worker thread
+    blocking = True
+
+    def __init__(self, db_path: str = "llm_cache.sqlite", max_entries: int = 10000, touch_interval: float = 300):
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_accessed ON llm_cache (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at, accessed_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if not row or now >= row[1]:
+                return None
+            if now - row[2] >= self.touch_interval:
+                self._conn.execute("UPDATE llm_cache SET accessed_at = ? WHERE key = ?", (now, key))
+                self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: int):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now),
+            )
+            self._conn.execute("DELETE FROM llm_cache WHERE expires_at <= ?", (now,))
+            self._conn.execute(
+                "DELETE FROM llm_cache WHERE key IN ("
+                "SELECT key FROM llm_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+class LLMResponseCache:
+    """
+    Exact-match cache for deterministic prompt chains, keyed on
+    (model, temperature, hash of the rendered prompt). Hit/miss counters are kept per chain.
+    """
+
+    def __init__(self, store, ttls: Optional[dict] = None, default_ttl: int = 3600):
+        self.store = store
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self._stats = defaultdict(lambda: {"hits": 0, "misses": 0})
+
+    @staticmethod
+    def make_key(llm, rendered_prompt: str) -> str:
+        model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+        temperature = getattr(llm, "temperature", None)
+        digest = hashlib.sha256(rendered_prompt.encode("utf-8")).hexdigest()
+        return f"{model}:{temperature}:{digest}"
+
+    def get(self, chain_name: str, key: str) -> Optional[str]:
+        value = self.store.get(f"{chain_name}:{key}")
+        self._stats[chain_name]["hits" if value is not None else "misses"] += 1
+        return value
+
+    def set(self, chain_name: str, key: str, value: str):
+        self.store.set(f"{chain_name}:{key}", value, self.ttls.get(chain_name, self.default_ttl))
+
+    async def aget(self, chain_name: str, key: str) -> Optional[str]:
+        if self.store.blocking:
+            return await asyncio.to_thread(self.get, chain_name, key)
+        return self.get(chain_name, key)
+
+    async def aset(self, chain_name: str, key: str, value: str):
+        if self.store.blocking:
+            await asyncio.to_thread(self.set, chain_name, key, value)
+        else:
+            self.set(chain_name, key, value)
+
+    def stats(self) -> dict:
+        chains = {}
+        for name, counts in self._stats.items():
+            lookups = counts["hits"] + counts["misses"]
+            chains[name] = {**counts, "hit_rate": counts["hits"] / lookups if lookups else 0.0}
+        return {"entries": len(self.store), "chains": chains}
+
+
+llm_cache = None
+if LLM_CACHE_ENABLED:
+    if LLM_CACHE_BACKEND == "sqlite":
+        _store = SqliteResponseStore(LLM_CACHE_PATH, max_entries=LLM_CACHE_MAX_ENTRIES)
+    else:
+        _store = MemoryResponseStore(max_entries=LLM_CACHE_MAX_ENTRIES)
+    llm_cache = LLMResponseCache(_store, ttls=LLM_CACHE_TTLS)
+
+
+def cached_chain(chain_name: str, prompt, llm):
+    """
+    Builds `prompt | llm | StrOutputParser()`, served from the response cache when
+    LLM_CACHE_ENABLED is set. Only use this for chains whose output is a pure function
+    of their inputs (query generation, classification, index matching).
+    """
+    chain = prompt | llm | StrOutputParser()
+    if llm_cache is None:
+        return chain
+
+    async def _run(inputs: dict) -> str:
+        prompt_value = await prompt.ainvoke(inputs)
+        key = llm_cache.make_key(llm, prompt_value.to_string())
+        cached = await llm_cache.aget(chain_name, key)
+        if cached is not None:
+            return cached
+        result = await (llm | StrOutputParser()).ainvoke(prompt_value)
+        await llm_cache.aset(chain_name, key, result)
+        return result
+
+    return RunnableLambda(_run, name=chain_name)
@@ -1,6 +1,5 @@
 # src/graph.py
 from langgraph.graph import StateGraph, END
-from langgraph.checkpoint.memory import MemorySaver
 
 from .marketing_nodes import (
     AgentState,
@@ -11,14 +10,21 @@ from .marketing_nodes import (
     check_satisfaction,
     send_email_node
 )
-from ..config import USE_REDIS, redis_client
+from ..config import USE_REDIS, redis_client, MEMORY_SAVER_MAX_THREADS, MEMORY_SAVER_MAX_MB, MEMORY_SAVER_SPILL_PATH
+from ..checkpoint_serde import make_serializer
+from ..bounded_memory_saver import BoundedMemorySaver
 
-# Use RedisSaver if configured and available, otherwise fall back to MemorySaver
+# Use RedisSaver if configured and available, otherwise fall back to a bounded in-memory saver
 if USE_REDIS and redis_client:
     from langgraph.checkpoint.redis import RedisSaver
     checkpointer = RedisSaver(redis_client=redis_client)
 else:
-    checkpointer = MemorySaver()
+    checkpointer = BoundedMemorySaver(
+        max_threads=MEMORY_SAVER_MAX_THREADS,
+        max_bytes=MEMORY_SAVER_MAX_MB * 1024 * 1024,
+        spill_path=MEMORY_SAVER_SPILL_PATH,
+        serde=make_serializer(),
+    )
 
 def master_router(state: AgentState) -> str:
     """Routes to the correct node based on the current state."""
@@ -1,27 +1,66 @@
 # src/nodes.py
 import re
 import os
+import asyncio
 from typing import TypedDict, Annotated, Sequence, Optional
 
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableConfig
+from langchain_core.callbacks.manager import adispatch_custom_event
 from langchain_community.utilities import DuckDuckGoSearchAPIWrapper
-from langgraph.graph.message import add_messages
 from langchain_groq import ChatGroq
 
-from ..config import GROQ_API_KEY
+from ..config import (
+    GROQ_API_KEY,
+    STREAM_TAG,
+    SEARCH_CACHE_ENABLED,
+    SEARCH_CACHE_PATH,
+    SEARCH_CACHE_TTL,
+    SEARCH_CACHE_MEMORY_ENTRIES,
+    SEARCH_CACHE_MAX_BYTES,
+    GUIDE_PREFETCH_ENABLED,
+    GUIDE_PREFETCH_MAX_THREADS,
+    GUIDE_PREFETCH_CONCURRENCY,
+    STRATEGY_SPECULATION_ENABLED,
+    STRATEGY_SPECULATION_MAX_THREADS,
+    STRATEGY_SPECULATION_CONCURRENCY,
+    CONTEXT_POLICIES,
+)
+from ..fanout import run_branches
+from ..search_cache import CachedSearchWrapper
+from ..llm_cache import cached_chain
+from ..transcript import add_messages_window
+from ..context_manager import bounded_history, truncate_to_tokens, prompt_token_counter
+from ..models import ProductDetailsExtraction
+from .reply_parser import parse_strategy_selection, parse_satisfaction, record, FAREWELL_MESSAGE
+from .prefetch import SpeculativeTasks
+from .strategy_parser import StrategyStreamParser
+from .query_builder import build_strategy_query, build_guide_query, MIN_KNOWN_FIELDS
 
 if GROQ_API_KEY:
     os.environ["GROQ_API_KEY"] = GROQ_API_KEY
 
 # Initialize shared components
-llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.7)
+llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.7, callbacks=[prompt_token_counter])
 web_search_wrapper = DuckDuckGoSearchAPIWrapper()
+if SEARCH_CACHE_ENABLED:
+    web_search_wrapper = CachedSearchWrapper(
+        web_search_wrapper,
+        db_path=SEARCH_CACHE_PATH,
+        ttl_seconds=SEARCH_CACHE_TTL,
+        memory_entries=SEARCH_CACHE_MEMORY_ENTRIES,
+        max_bytes=SEARCH_CACHE_MAX_BYTES,
+    )
+
+async def search_web(query: str, max_results: int) -> list[dict]:
+    """Runs a DuckDuckGo search without blocking the event loop (the wrapper has no async API)."""
+    return await asyncio.to_thread(web_search_wrapper.results, query, max_results=max_results)
 
 # Define the state (shared with graph.py)
 class AgentState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], add_messages]
+    messages: Annotated[Sequence[BaseMessage], add_messages_window]
     product_details: Optional[str]
     strategies: Optional[list[str]]
     selected_strategy: Optional[str]
@@ -29,58 +68,137 @@ class AgentState(TypedDict):
     guided: bool
     user_email: Optional[str]
     strategy_guide: Optional[str]
+    # Rolling summary of the messages that no longer fit in the prompt (see context_manager)
+    context_summary: Optional[str]
+    context_summary_upto: Optional[str]
 
-def gather_product_details(state: AgentState) -> dict:
+async def gather_product_details(state: AgentState, config: RunnableConfig) -> dict:
     """Gathers product details from the user."""
     messages = state["messages"]
     if messages and isinstance(messages[-1], HumanMessage):
-        user_input = messages[-1].content
-        extract_prompt = ChatPromptTemplate.from_messages([
-            ("system", "You are an expert at extracting product details from a user's message. Summarize the user's description into a structured format. Output ONLY in this format, no more no less:\nName: [name or 'unknown']\nFeatures: [comma-separated list or 'unknown']\nTarget Audience: [description or 'unknown']\nGoals: [description or 'unknown']"),
-            ("human", "{user_input}"),
-        ])
-        extract_chain = extract_prompt | llm | StrOutputParser()
-        product_details_raw = extract_chain.invoke({"user_input": user_input})
-        
-        if product_details_raw.strip().startswith('Name:') and '\n' in product_details_raw:
-            # Check if we have enough details. At least Features, Target Audience, AND Goals must be known.
-            details_map = {}
-            for line in product_details_raw.split('\n'):
-                if ':' in line:
-                    key, val = line.split(':', 1)
-                    details_map[key.strip()] = val.strip().lower()
-            
-            missing_fields = [k for k, v in details_map.items() if 'unknown' in v]
-            
-            # If we have most details (allow Name to be unknown if others are present, but usually name is key)
-            # Let's be strict: We need at least 3 fields to be known.
-            known_fields_count = sum(1 for v in details_map.values() if 'unknown' not in v)
-            
-            if known_fields_count >= 3:
-                confirmation = f"Understood. Based on your input, here's what I've gathered about your product:\n\n{product_details_raw.strip()}\n\nShall I proceed with generating strategies based on this?"
-                return {"product_details": product_details_raw.strip(), "messages": [AIMessage(content=confirmation)]}
+        # Extraction reads the latest reply; the question it answers keeps follow-ups from repeating themselves
+        recent = messages[-2:] if len(messages) > 1 and isinstance(messages[-2], AIMessage) else messages[-1:]
+        # One structured call extracts the fields and, if needed, writes the follow-up questions
+        extraction = await _extract_product_details(recent)
+        if extraction is None:
+            # Structured output failed validation; fall back to the plain-text extraction prompt
+            product_details = await _extract_product_details_text(messages[-1].content)
+        elif extraction.known_fields_count() >= MIN_KNOWN_FIELDS:
+            product_details = extraction.to_product_details()
+        elif extraction.follow_up_questions:
+            # The structured call can't stream tokens, so the finished questions go out as one chunk
+            await _emit("message", {"content": extraction.follow_up_questions})
+            return {"messages": [AIMessage(content=extraction.follow_up_questions)]}
+        else:
+            product_details = None
 
+        if product_details:
+            confirmation = f"Understood. Based on your input, here's what I've gathered about your product:\n\n{product_details}\n\nShall I proceed with generating strategies based on this?"
+            thread_id = config.get("configurable", {}).get("thread_id")
+            if strategy_speculator and thread_id:
+                # The next turn is almost always "yes", so start on the strategies now
+                strategy_speculator.start(thread_id, product_details, {"strategies": (product_details,)})
+            return {"product_details": product_details, "messages": [AIMessage(content=confirmation)]}
+
+    # Long sessions send a bounded window of recent messages plus a summary of the rest
+    history, context_update = await bounded_history("gather_product", state, llm)
     prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a trendy, energetic marketing genius! 🚀 Your goal is to hype up the user and get the deets on their product. Don't be boring. Ask 3-4 punchy questions to understand their vibe, target audience, and goals. Use emojis and keep it fresh! If the user's previous answer was vague, ask for specific details."),
+        ("system", FOLLOW_UP_QUESTIONS_PROMPT),
         MessagesPlaceholder(variable_name="messages"),
     ])
-    response = (prompt | llm | StrOutputParser()).invoke({"messages": messages})
-    return {"messages": [AIMessage(content=response)]}
+    response = await (prompt | llm | StrOutputParser()).with_config(tags=[STREAM_TAG]).ainvoke({"messages": history})
+    return {"messages": [AIMessage(content=response)], **context_update}
 
-def generate_strategies(state: AgentState) -> dict:
-    """Generates marketing strategies with specific source URLs."""
+FOLLOW_UP_QUESTIONS_PROMPT = "You are a trendy, energetic marketing genius! 🚀 Your goal is to hype up the user and get the deets on their product. Don't be boring. Ask 3-4 punchy questions to understand their vibe, target audience, and goals. Use emojis and keep it fresh! If the user's previous answer was vague, ask for specific details."
+
+async def _extract_product_details(messages: Sequence[BaseMessage]) -> Optional[ProductDetailsExtraction]:
+    """
+    Extracts product details from the latest user message and, when fewer than three
+    fields are known, writes follow-up questions in the same call. Returns None if the
+    model's output doesn't validate against the schema.
+    """
+    prompt = ChatPromptTemplate.from_messages([
+        ("system", "You are an expert at extracting product details from a user's message. Fill in the product's name, features, target audience and goals from the user's LATEST message only, using 'unknown' for anything they did not state.\n\nIf fewer than three of those four fields are known, also write follow_up_questions in this voice:\n" + FOLLOW_UP_QUESTIONS_PROMPT + "\nOtherwise leave follow_up_questions empty."),
+        MessagesPlaceholder(variable_name="messages"),
+    ])
+    try:
+        chain = prompt | llm.with_structured_output(ProductDetailsExtraction)
+        return await chain.ainvoke({"messages": messages})
+    except Exception as e:
+        print(f"--- Structured product extraction failed, falling back: {e} ---")
+        return None
+
+async def _extract_product_details_text(user_input: str) -> Optional[str]:
+    """Plain-text extraction fallback. Returns the details block if at least MIN_KNOWN_FIELDS fields are known."""
+    extract_prompt = ChatPromptTemplate.from_messages([
+        ("system", "You are an expert at extracting product details from a user's message. Summarize the user's description into a structured format. Output ONLY in this format, no more no less:\nName: [name or 'unknown']\nFeatures: [comma-separated list or 'unknown']\nTarget Audience: [description or 'unknown']\nGoals: [description or 'unknown']"),
+        ("human", "{user_input}"),
+    ])
+    extract_chain = extract_prompt | llm | StrOutputParser()
+    product_details_raw = await extract_chain.ainvoke({"user_input": user_input})
+
+    if product_details_raw.strip().startswith('Name:') and '\n' in product_details_raw:
+        details_map = {}
+        for line in product_details_raw.split('\n'):
+            if ':' in line:
+                key, val = line.split(':', 1)
+                details_map[key.strip()] = val.strip().lower()
+
+        known_fields_count = sum(1 for v in details_map.values() if 'unknown' not in v)
+        if known_fields_count >= MIN_KNOWN_FIELDS:
+            return product_details_raw.strip()
+    return None
+
+async def generate_strategies(state: AgentState, config: RunnableConfig) -> dict:
+    """Generates marketing strategies, attaching to a speculative run if one was started."""
     product_details = state["product_details"]
-    
-    # Generate a dynamic search query based on the product details
+    thread_id = config.get("configurable", {}).get("thread_id")
+
+    result = None
+    if strategy_speculator and thread_id:
+        result = await strategy_speculator.take(thread_id, product_details, "strategies")
+    if result is None:
+        result = await build_strategies(product_details)
+
+    if result.get("strategies") and guide_prefetcher and thread_id:
+        # The user nearly always picks one next, so start building the guides now
+        strategies = result["strategies"]
+        guide_prefetcher.start(thread_id, product_details, {s: (product_details, s) for s in strategies})
+    return result
+
+async def generate_strategy_query_llm(product_details: str) -> str:
+    """Asks the LLM for a search query to find marketing strategies for the product."""
     query_generation_prompt = ChatPromptTemplate.from_messages([
         ("system", "You are an expert at crafting effective web search queries. Based on the following product details, generate a single, concise search query to find the best marketing strategies. Output ONLY the search query itself, with no extra text or quotation marks."),
         ("human", "{product_details}"),
     ])
-    query_generation_chain = query_generation_prompt | llm | StrOutputParser()
-    search_query = query_generation_chain.invoke({"product_details": product_details})
-    
+    query_generation_chain = cached_chain("strategy_query_generation", query_generation_prompt, llm)
+    return await query_generation_chain.ainvoke({"product_details": product_details})
+
+async def _search_with_generated_query(product_details: str) -> list[dict]:
+    """Searches with an LLM-written query, for details whose fields the template can't use."""
+    search_query = await generate_strategy_query_llm(product_details)
     print(f"--- Searching the web for: {search_query} ---")
-    search_results_list = web_search_wrapper.results(search_query, max_results=5)
+    return await search_web(search_query, max_results=5)
+
+async def _emit(name: str, data: dict):
+    """Publishes a custom event ('strategy' or 'message') for /api/agent/chat/stream."""
+    try:
+        await adispatch_custom_event(name, data)
+    except RuntimeError:
+        # No parent run to attach to (e.g. speculative generation in the background)
+        pass
+
+async def build_strategies(product_details: str) -> dict:
+    """Generates marketing strategies with specific source URLs."""
+    
+    # Compose the search query from the extracted fields; the LLM only writes it when they don't parse (see MIN_KNOWN_FIELDS)
+    template_query = build_strategy_query(product_details)
+    if template_query:
+        print(f"--- Searching the web for: {template_query} ---")
+        search_results_list = await search_web(template_query, max_results=5)
+    else:
+        search_results_list = await _search_with_generated_query(product_details)
     
     source_map = {i + 1: result['link'] for i, result in enumerate(search_results_list)}
     formatted_search_results = "\n\n".join(
@@ -93,38 +211,19 @@ def generate_strategies(state: AgentState) -> dict:
     ])
     
     citation_chain = citation_prompt | llm | StrOutputParser()
-    strategies_with_citations = citation_chain.invoke({
+    parser = StrategyStreamParser(source_map)
+    # Parse while the model is still generating, so each strategy can be streamed as soon as its line is done
+    async for chunk in citation_chain.astream({
         "product_details": product_details,
         "search_results": formatted_search_results
-    })
-    
-    final_strategies = []
-    final_response_lines = []
-    pattern = re.compile(r'\(Source:\s*\[?(\d+)\]?\)')
-
-    for line in strategies_with_citations.split('\n'):
-        line = line.strip()
-        if not line: 
-            continue
-            
-        # Check for source citation
-        match = pattern.search(line)
-        if match:
-            source_num = int(match.group(1))
-            source_url = source_map.get(source_num, "Source not found")
-            
-            # Remove the citation from the text to avoid duplication
-            strategy_text = pattern.sub('', line).strip()
-            # Clean up leading numbers/bullets if present
-            strategy_text = re.sub(r'^\d+\.\s*', '', strategy_text)
-            
-            final_strategies.append(strategy_text)
-            final_response_lines.append(f"**Strategy {len(final_strategies)}:** {strategy_text}\n*Source: {source_url}*")
-        elif len(line) > 10 and line[0].isdigit(): 
-            # Fallback: If it looks like a strategy but missed citation, include it anyway
-            strategy_text = re.sub(r'^\d+\.\s*', '', line)
-            final_strategies.append(strategy_text)
-            final_response_lines.append(f"**Strategy {len(final_strategies)}:** {strategy_text}")
+    }):
+        for strategy in parser.feed(chunk):
+            await _emit("strategy", strategy)
+    for strategy in parser.close():
+        await _emit("strategy", strategy)
+
+    final_strategies = parser.strategies
+    final_response_lines = parser.response_lines
 
     if not final_response_lines:
         return {"messages": [AIMessage(content="I researched some strategies, but had trouble formatting them with specific sources. Please try describing your product again.")]}
@@ -136,7 +235,7 @@ def generate_strategies(state: AgentState) -> dict:
         "strategies": final_strategies,
     }
 
-def select_strategy(state: AgentState) -> dict:
+async def select_strategy(state: AgentState) -> dict:
     """Processes the user's strategy selection using LLM for flexibility."""
     messages = state["messages"]
     strategies = state.get("strategies", [])
@@ -146,6 +245,12 @@ def select_strategy(state: AgentState) -> dict:
 
     if messages and isinstance(messages[-1], HumanMessage):
         user_input = messages[-1].content
+
+        # Numbers, ordinals and clear name matches are resolved locally
+        num = parse_strategy_selection(user_input, strategies)
+        record("strategy_selection", num is not None)
+        if num is not None:
+            return {"selected_strategy": strategies[num - 1]}
         
         # Use LLM to match user input to a strategy index
         strategies_list_str = "\n".join([f"{i+1}. {s}" for i, s in enumerate(strategies)])
@@ -164,8 +269,8 @@ def select_strategy(state: AgentState) -> dict:
             Output ONLY the number."""),
         ])
         
-        chain = selection_prompt | llm | StrOutputParser()
-        result = chain.invoke({
+        chain = cached_chain("strategy_selection", selection_prompt, llm)
+        result = await chain.ainvoke({
             "strategies_list": strategies_list_str,
             "user_input": user_input
         })
@@ -184,35 +289,55 @@ def select_strategy(state: AgentState) -> dict:
     response = f"Which strategy do you like best? You can tell me the number or just say the name! 🏆"
     return {"messages": [AIMessage(content=response)]}
 
-def guide_strategy(state: AgentState) -> dict:
+async def guide_strategy(state: AgentState, config: RunnableConfig) -> dict:
     """Provides a detailed guide for the selected strategy with tool recommendations."""
     selected = state["selected_strategy"]
     product = state["product_details"]
 
-    # 1. Search for implementation guide
+    response = None
+    thread_id = config.get("configurable", {}).get("thread_id")
+    if guide_prefetcher and thread_id:
+        response = await guide_prefetcher.take(thread_id, product, selected)
+    if response is None:
+        response = await build_strategy_guide(product, selected)
+    return {"messages": [AIMessage(content=response)], "guided": True, "strategy_guide": response}
+
+async def generate_guide_query_llm(product: str, selected: str) -> str:
+    """Asks the LLM for a search query to find an implementation guide for the strategy."""
     query_generation_prompt = ChatPromptTemplate.from_messages([
         ("system", "You are an expert at crafting effective web search queries. Based on the following product and selected marketing strategy, generate a single, concise search query to find a step-by-step guide for implementation. Output ONLY the search query itself."),
         ("human", "Product: {product_details}\n\nStrategy: {strategy}"),
     ])
-    query_chain = query_generation_prompt | llm | StrOutputParser()
-    guide_query = query_chain.invoke({"product_details": product, "strategy": selected})
+    query_chain = cached_chain("guide_query_generation", query_generation_prompt, llm)
+    return await query_chain.ainvoke({"product_details": product, "strategy": selected})
 
-    print(f"--- Searching for guide: {guide_query} ---")
-    guide_results = web_search_wrapper.results(guide_query, max_results=3)
-    formatted_guide_results = "\n".join([f"Title: {res['title']}\nSnippet: {res['snippet']}" for res in guide_results])
+async def build_strategy_guide(product: str, selected: str) -> str:
+    """Searches for an implementation guide and tools, and writes the step-by-step guide."""
+    # 1. Search for implementation guide (template query unless the product fields don't parse)
+    async def guide_search():
+        guide_query = build_guide_query(product, selected) or await generate_guide_query_llm(product, selected)
+        print(f"--- Searching for guide: {guide_query} ---")
+        return await search_web(guide_query, max_results=3)
 
-    # 2. Search for tools
+    # 2. Search for tools (doesn't depend on the generated query, so it runs in parallel)
     tool_query = f"best software tools for {selected} marketing 2024"
     print(f"--- Searching for tools: {tool_query} ---")
-    tool_results = web_search_wrapper.results(tool_query, max_results=3)
+    branches = await run_branches({
+        "guide_search": guide_search(),
+        "tool_search": search_web(tool_query, max_results=3),
+    })
+
+    guide_results = branches["guide_search"] or []
+    tool_results = branches["tool_search"] or []
+    formatted_guide_results = "\n".join([f"Title: {res['title']}\nSnippet: {res['snippet']}" for res in guide_results])
     formatted_tool_results = "\n".join([f"Title: {res['title']}\nSnippet: {res['snippet']}" for res in tool_results])
 
     prompt = ChatPromptTemplate.from_messages([
         ("system", "You are a marketing expert. Provide a clear, step-by-step approach to implement the selected strategy. ALSO, recommend specific software tools that can help. Format the output clearly using Markdown. Output EXACTLY in this structure:\n\nGreat choice! Here is your step-by-step guide:\n\n### Steps:\n1. [step1]\n2. [step2]\n...\n\n### Recommended Tools 🛠️:\n- **[Tool Name]**: [Brief description]\n- **[Tool Name]**: [Brief description]\n...\n\n### Required Documents:\n- [doc1]\n- [doc2]\n..."),
         ("human", "Product: {product}\nStrategy: {strategy}\nGuide Search: {guide_results}\nTool Search: {tool_results}"),
     ])
-    chain = prompt | llm | StrOutputParser()
-    response = chain.invoke({
+    chain = (prompt | llm | StrOutputParser()).with_config(tags=[STREAM_TAG])
+    response = await chain.ainvoke({
         "product": product, 
         "strategy": selected, 
         "guide_results": formatted_guide_results,
@@ -220,9 +345,39 @@ def guide_strategy(state: AgentState) -> dict:
     })
     
     response += "\n\nReady to execute this? Or would you like me to email this guide to you? 📧"
-    return {"messages": [AIMessage(content=response)], "guided": True, "strategy_guide": response}
+    return response
+
+guide_prefetcher = None
+if GUIDE_PREFETCH_ENABLED:
+    guide_prefetcher = SpeculativeTasks(
+        build_strategy_guide,
+        max_threads=GUIDE_PREFETCH_MAX_THREADS,
+        concurrency=GUIDE_PREFETCH_CONCURRENCY,
+    )
 
-def check_satisfaction(state: AgentState) -> dict:
+strategy_speculator = None
+if STRATEGY_SPECULATION_ENABLED:
+    strategy_speculator = SpeculativeTasks(
+        build_strategies,
+        max_threads=STRATEGY_SPECULATION_MAX_THREADS,
+        concurrency=STRATEGY_SPECULATION_CONCURRENCY,
+    )
+
+def _satisfaction_update(verdict: str) -> dict:
+    """State update for a SATISFIED / DISSATISFIED verdict on the strategy guide."""
+    if verdict == "SATISFIED":
+        return {
+            "satisfaction": True,
+            "messages": [AIMessage(content="Awesome! I'm sending this guide to your email right now! 📧")]
+        }
+    return {
+        "selected_strategy": None,
+        "satisfaction": False,
+        "guided": False,
+        "messages": [AIMessage(content="No worries! Let's pivot. Please select another strategy from the list I provided earlier.")]
+    }
+
+async def check_satisfaction(state: AgentState) -> dict:
     """Checks if the user is satisfied, wants to change, or has questions."""
     messages = state["messages"]
     strategy = state.get("selected_strategy")
@@ -230,6 +385,14 @@ def check_satisfaction(state: AgentState) -> dict:
     
     if messages and isinstance(messages[-1], HumanMessage):
         user_input = messages[-1].content
+
+        # Clear yes/no/email/bye replies are classified locally
+        verdict = parse_satisfaction(user_input)
+        record("satisfaction", verdict is not None)
+        if verdict == "FAREWELL":
+            return {"messages": [AIMessage(content=FAREWELL_MESSAGE)]}
+        if verdict:
+            return _satisfaction_update(verdict)
         
         # Use LLM to classify and respond
         prompt = ChatPromptTemplate.from_messages([
@@ -255,27 +418,20 @@ def check_satisfaction(state: AgentState) -> dict:
         ])
         
         chain = prompt | llm | StrOutputParser()
-        response = chain.invoke({
+        response = await chain.ainvoke({
             "strategy": strategy,
-            "guide": guide[:2000], # Truncate guide to avoid context limit if too huge, though 8b should handle it
+            "guide": truncate_to_tokens(guide, CONTEXT_POLICIES["check_satisfaction"]["guide_tokens"]),
             "user_input": user_input
         })
         
         cleaned_response = response.strip()
         cleaned_response_upper = cleaned_response.upper()
         
-        if "SATISFIED" in cleaned_response_upper:
-            return {
-                "satisfaction": True,
-                "messages": [AIMessage(content="Awesome! I'm sending this guide to your email right now! 📧")]
-            }
-        elif "DISSATISFIED" in cleaned_response_upper:
-            return {
-                "selected_strategy": None,
-                "satisfaction": False,
-                "guided": False,
-                "messages": [AIMessage(content="No worries! Let's pivot. Please select another strategy from the list I provided earlier.")]
-            }
+        # Check DISSATISFIED first, since it contains SATISFIED
+        if "DISSATISFIED" in cleaned_response_upper:
+            return _satisfaction_update("DISSATISFIED")
+        elif "SATISFIED" in cleaned_response_upper:
+            return _satisfaction_update("SATISFIED")
         else:
             # It's a question or comment, return the LLM's response
             return {"messages": [AIMessage(content=cleaned_response)]}
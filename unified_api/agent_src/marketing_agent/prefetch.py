@@ -0,0 +1,94 @@
+import asyncio
+import contextvars
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+
+class SpeculativeTasks:
+    """
+    Runs work for a session's likely next turn in the background, so the node that
+    needs it can attach to the in-flight or finished result instead of starting over.
+    Used for strategy guides (built for every listed strategy while the user picks one)
+    and for strategies (built as soon as product details are confirmed).
+
+    Tasks are stored per thread_id (LRU, at most `max_threads` threads) together with
+    the `basis` they were built from, e.g. the product details. A result is only handed
+    out if the basis still matches, so stale work is discarded. At most `concurrency`
+    tasks run at once across all threads. Starting new work for a thread, or calling
+    cancel(), cancels whatever that thread still has in flight.
+    """
+
+    def __init__(self, build: Callable[..., Awaitable[Any]], max_threads: int = 100, concurrency: int = 4):
+        self.build = build
+        self.max_threads = max_threads
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._threads: OrderedDict = OrderedDict()
+        self._stats = {"started": 0, "hits": 0, "misses": 0, "stale": 0, "cancelled": 0}
+
+    def start(self, thread_id: str, basis: str, jobs: dict[str, tuple]):
+        """Starts `build(*args)` for each job key; returns immediately."""
+        self.cancel(thread_id)
+        # Run in an empty context so the background LLM calls aren't attached to the
+        # current turn's callbacks (and its event stream) after the turn has ended
+        tasks = {
+            key: asyncio.create_task(self._build(key, args), context=contextvars.Context())
+            for key, args in jobs.items()
+        }
+        self._threads[thread_id] = {"basis": basis, "tasks": tasks}
+        self._stats["started"] += len(tasks)
+        while len(self._threads) > self.max_threads:
+            _, evicted = self._threads.popitem(last=False)
+            self._cancel_tasks(evicted["tasks"])
+
+    async def _build(self, key: str, args: tuple) -> Optional[Any]:
+        async with self._semaphore:
+            try:
+                return await self.build(*args)
+            except Exception as e:
+                print(f"--- Speculative {self.build.__name__} failed for '{key}': {e} ---")
+                return None
+
+    async def take(self, thread_id: str, basis: str, key: str) -> Optional[Any]:
+        """
+        Returns the speculative result for `key`, waiting for it if it is still running.
+        Returns None if nothing usable was prepared. The thread's other speculative
+        tasks are cancelled, since the session has moved on.
+        """
+        entry = self._threads.pop(thread_id, None)
+        task = None
+        if entry:
+            if entry["basis"] == basis:
+                task = entry["tasks"].pop(key, None)
+            else:
+                self._stats["stale"] += 1
+            self._cancel_tasks(entry["tasks"])
+
+        if task is None:
+            self._stats["misses"] += 1
+            return None
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            # Re-raise if it is this request being cancelled rather than the speculative task
+            if asyncio.current_task().cancelling():
+                raise
+            result = None
+        if result is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        return result
+
+    def cancel(self, thread_id: str):
+        entry = self._threads.pop(thread_id, None)
+        if entry:
+            self._cancel_tasks(entry["tasks"])
+
+    def _cancel_tasks(self, tasks: dict):
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+                self._stats["cancelled"] += 1
+
+    def stats(self) -> dict:
+        return {**self._stats, "threads": len(self._threads)}
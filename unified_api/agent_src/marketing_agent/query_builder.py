@@ -0,0 +1,105 @@
+"""
+Deterministic search queries composed from the extracted product fields, so
+generate_strategies and guide_strategy don't spend an LLM call writing them.
+
+Run `python -m agent_src.marketing_agent.query_builder` from unified_api/ for an A/B
+comparison against the LLM-generated queries (latency and search result overlap);
+it needs GROQ_API_KEY and network access.
+"""
+import re
+from typing import Optional
+
+FIELDS = ("Name", "Features", "Target Audience", "Goals")
+
+# Known fields needed both to accept product details (gather_product_details keeps asking
+# follow-up questions until then) and to build a query from them. Sparse details are handled
+# by the follow-up questions, so stored details only fall short here when their fields don't
+# parse (e.g. a reformatted block), and the callers then let the LLM write the query.
+MIN_KNOWN_FIELDS = 3
+
+
+def parse_product_details(product_details: Optional[str]) -> dict[str, str]:
+    """Parses the 'Name/Features/Target Audience/Goals' block; unknown fields are ''."""
+    details = {field: "" for field in FIELDS}
+    for line in (product_details or "").split('\n'):
+        if ':' in line:
+            key, val = line.split(':', 1)
+            for field in FIELDS:
+                if key.strip().lower() == field.lower() and 'unknown' not in val.lower():
+                    details[field] = val.strip()
+    return details
+
+
+def _shorten(text: str, max_words: int) -> str:
+    text = re.sub(r'[*_"()\[\]]', '', text)
+    words = text.replace(',', ' ').split()
+    return " ".join(words[:max_words]).rstrip('.')
+
+
+def _first_items(text: str, count: int) -> str:
+    return ", ".join(item.strip() for item in text.split(',')[:count] if item.strip())
+
+
+def build_strategy_query(product_details: str) -> Optional[str]:
+    """Query for marketing strategies, or None if fewer than MIN_KNOWN_FIELDS fields parse."""
+    details = parse_product_details(product_details)
+    if sum(1 for v in details.values() if v) < MIN_KNOWN_FIELDS:
+        return None
+    subject = _first_items(details["Features"], 2) or details["Name"]
+    parts = ["marketing strategies for", _shorten(subject, 8)]
+    if details["Target Audience"]:
+        parts += ["targeting", _shorten(details["Target Audience"], 6)]
+    if details["Goals"]:
+        parts += ["to", _shorten(details["Goals"], 6)]
+    return " ".join(p for p in parts if p)
+
+
+def build_guide_query(product_details: str, strategy: str) -> Optional[str]:
+    """Query for a step-by-step guide to the selected strategy, or None if fewer than MIN_KNOWN_FIELDS fields parse."""
+    details = parse_product_details(product_details)
+    if sum(1 for v in details.values() if v) < MIN_KNOWN_FIELDS:
+        return None
+    subject = _first_items(details["Features"], 1) or details["Name"] or details["Target Audience"]
+    return f"how to {_shorten(strategy, 10).lower()} for {_shorten(subject, 5)} step by step guide"
+
+
+if __name__ == "__main__":
+    import asyncio
+    import time
+
+    from .marketing_nodes import generate_strategy_query_llm, generate_guide_query_llm, search_web
+
+    SAMPLES = [
+        ("Name: FitTrack\nFeatures: step counting, sleep tracking, heart rate\nTarget Audience: amateur runners\nGoals: grow app downloads",
+         "Partner with running clubs to offer free trials."),
+        ("Name: Bean There\nFeatures: specialty coffee, coworking space\nTarget Audience: remote workers and students\nGoals: increase weekday foot traffic",
+         "Run a loyalty program on Instagram."),
+        ("Name: unknown\nFeatures: handmade soy candles, custom scents\nTarget Audience: gift shoppers\nGoals: unknown",
+         "Launch a seasonal email campaign."),
+    ]
+
+    def overlap(a: list[dict], b: list[dict]) -> float:
+        links_a, links_b = {r['link'] for r in a}, {r['link'] for r in b}
+        return len(links_a & links_b) / len(links_a | links_b) if links_a | links_b else 1.0
+
+    async def compare(name, template_fn, llm_fn, max_results):
+        t = time.perf_counter()
+        template_query = template_fn()
+        template_latency = time.perf_counter() - t
+        t = time.perf_counter()
+        llm_query = await llm_fn()
+        llm_latency = time.perf_counter() - t
+        template_results = await search_web(template_query, max_results=max_results) if template_query else []
+        llm_results = await search_web(llm_query, max_results=max_results)
+        print(f"[{name}]\n  template ({template_latency * 1000:.2f} ms): {template_query}\n"
+              f"  llm      ({llm_latency * 1000:.0f} ms): {llm_query}\n"
+              f"  result overlap (Jaccard on links): {overlap(template_results, llm_results):.0%}")
+
+    async def main():
+        for product, strategy in SAMPLES:
+            await compare("strategies", lambda: build_strategy_query(product),
+                          lambda: generate_strategy_query_llm(product), 5)
+            await compare("guide", lambda: build_guide_query(product, strategy),
+                          lambda: generate_guide_query_llm(product, strategy), 3)
+
+    asyncio.run(main())
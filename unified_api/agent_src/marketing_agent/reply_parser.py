@@ -0,0 +1,202 @@
+import re
+from difflib import SequenceMatcher
+from typing import Optional
+
+ORDINALS = {
+    "first": 1, "1st": 1,
+    "second": 2, "2nd": 2,
+    "third": 3, "3rd": 3,
+    "fourth": 4, "4th": 4,
+    "fifth": 5, "5th": 5,
+}
+# Cardinals are common outside selections ("five local gyms"), so they only count as the
+# whole reply or next to option/strategy (see CARDINAL_PATTERN)
+CARDINALS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5}
+STOPWORDS = {
+    "the", "one", "that", "this", "with", "about", "like", "want", "pick", "choose", "go", "for",
+    "strategy", "option", "please", "i'd", "i'll", "let's", "take", "think", "which", "and",
+}
+
+NUMBER_PATTERN = re.compile(r"^\s*(?:#|no\.?\s*|number\s+|option\s+|strategy\s+)?(\d+)\s*[.!)]?\s*$", re.IGNORECASE)
+# Ordinals start plenty of other sentences too ("first, what does...", "last year we..."), so
+# like cardinals they only count as the whole reply or followed by one/option/strategy
+_ORDINAL = "(" + "|".join(ORDINALS) + "|last)"
+ORDINAL_PATTERN = re.compile(
+    r"^\s*(?:the\s+)?" + _ORDINAL + r"\s*[.!)]?\s*$"
+    r"|\b" + _ORDINAL + r"\s+(?:one|option|strategy)\b",
+    re.IGNORECASE,
+)
+_CARDINAL = "(" + "|".join(CARDINALS) + ")"
+CARDINAL_PATTERN = re.compile(
+    r"^\s*(?:number\s+|option\s+|strategy\s+)?" + _CARDINAL + r"\s*[.!)]?\s*$"
+    r"|\b(?:option|strategy|number)\s+" + _CARDINAL + r"\b"
+    r"|\b(two|three|four|five)\s+(?:one|option|strategy)\b",
+    re.IGNORECASE,
+)
+
+# "send" alone is not an email request ("send me another strategy"); only "send it/this/the guide"
+# counts, and not when a request for something else follows ("send the guide again but better")
+EMAIL_PATTERN = re.compile(
+    r"\b(e-?mail|mail|inbox)\b"
+    r"|\bsend (it|this|the guide)\b(?!.*\b(another|different|new|more|better|other)\b)",
+    re.IGNORECASE,
+)
+# Any other reply mentioning "send" is left to the LLM
+SEND_PATTERN = re.compile(r"\bsend\b", re.IGNORECASE)
+# A negation ahead of the email request ("don't email me yet") leaves the reply to the LLM
+EMAIL_NEGATION_PATTERN = re.compile(r"\b(don'?t|do not|no|not|never)\b", re.IGNORECASE)
+SATISFIED_PATTERN = re.compile(
+    r"^\s*(yes|yeah|yep|yup|sure|ok|okay|good|great|perfect|awesome|love it|looks good|sounds good|"
+    r"works( for me)?|that works|i'?m happy|satisfied|let'?s do it|do it)\b[\s,!.]*(thanks|thank you)?[\s!.]*$",
+    re.IGNORECASE,
+)
+# A bare negation only counts at the start of the reply, and not as "no problem" / "no worries"
+NEGATION_PATTERN = re.compile(r"^\s*(no|nope|nah)\b(?!\s+(problem|problems|worries|worry|issues?|doubt)\b)", re.IGNORECASE)
+DISSATISFIED_PATTERN = re.compile(
+    r"\b(not good|not great|don'?t like|do not like|doesn'?t work|does not work|"
+    r"doesn'?t suit|not suit\w*|change( it)?|another( one| strategy)?|different( one| strategy)?|try (again|another|something else))\b",
+    re.IGNORECASE,
+)
+# Praise left over after removing the negative phrases marks a mixed reply ("no, that's perfect")
+POSITIVE_PATTERN = re.compile(
+    r"\b(yes|yeah|good|great|perfect|awesome|excellent|nice|love|like|happy|fine|works|helpful|thanks|thank you)\b",
+    re.IGNORECASE,
+)
+FAREWELL_PATTERN = re.compile(r"^\s*(bye|goodbye|good bye|exit|quit|thanks|thank you|cheers)\b[\s!.]*(bye|so much)?[\s!.]*$", re.IGNORECASE)
+
+FAREWELL_MESSAGE = "Happy marketing! 🚀 Come back anytime you need a hand."
+
+# Fraction of turns resolved without an LLM call (exposed via /api/agent/metrics)
+PARSER_STATS = {
+    "strategy_selection": {"local": 0, "llm": 0},
+    "satisfaction": {"local": 0, "llm": 0},
+}
+
+
+def record(parser: str, resolved: bool):
+    PARSER_STATS[parser]["local" if resolved else "llm"] += 1
+
+
+def parser_stats() -> dict:
+    stats = {}
+    for name, counts in PARSER_STATS.items():
+        total = counts["local"] + counts["llm"]
+        stats[name] = {**counts, "local_fraction": counts["local"] / total if total else 0.0}
+    return stats
+
+
+def _content_words(text: str) -> set[str]:
+    return {w for w in re.findall(r"[a-z0-9']+", text.lower()) if len(w) > 2 and w not in STOPWORDS}
+
+
+def parse_strategy_selection(user_input: str, strategies: list[str]) -> Optional[int]:
+    """
+    Maps a reply like "2", "the first one" or "the social media one" to a 1-based
+    strategy index. Returns None when the reply is ambiguous, so the LLM can decide.
+    """
+    text = user_input.strip()
+    # Questions about the options ("what does option 2 involve?") are not selections
+    if not text or not strategies or "?" in text:
+        return None
+
+    match = NUMBER_PATTERN.match(text)
+    if match:
+        num = int(match.group(1))
+        return num if 1 <= num <= len(strategies) else None
+
+    nums = set()
+    for m in ORDINAL_PATTERN.finditer(text):
+        word = next(group for group in m.groups() if group).lower()
+        nums.add(len(strategies) if word == "last" else ORDINALS[word])
+    for m in CARDINAL_PATTERN.finditer(text):
+        nums.add(CARDINALS[next(group for group in m.groups() if group).lower()])
+    if len(nums) == 1:
+        num = nums.pop()
+        if 1 <= num <= len(strategies):
+            return num
+
+    # Fuzzy match against the strategy texts: word overlap, tie-broken by character similarity
+    words = _content_words(text)
+    if not words:
+        return None
+    scores = []
+    for i, strategy in enumerate(strategies):
+        overlap = len(words & _content_words(strategy)) / len(words)
+        similarity = SequenceMatcher(None, text.lower(), strategy.lower()).ratio()
+        scores.append((overlap + 0.5 * similarity, i + 1))
+    scores.sort(reverse=True)
+    best_score, best_index = scores[0]
+    runner_up = scores[1][0] if len(scores) > 1 else 0.0
+    if best_score >= 0.6 and best_score - runner_up >= 0.25:
+        return best_index
+    return None
+
+
+def parse_satisfaction(user_input: str) -> Optional[str]:
+    """
+    Classifies a reply to the strategy guide as 'SATISFIED', 'DISSATISFIED' or 'FAREWELL'
+    using the same priority as the check_satisfaction prompt (email requests first).
+    Returns None for questions and anything else that needs the LLM.
+    """
+    text = user_input.strip()
+    if not text:
+        return None
+    email = EMAIL_PATTERN.search(text)
+    if email:
+        return None if EMAIL_NEGATION_PATTERN.search(text[:email.start()]) else "SATISFIED"
+    if SEND_PATTERN.search(text):
+        return None
+    if "?" in text:
+        return None
+    if SATISFIED_PATTERN.match(text):
+        return "SATISFIED"
+    if FAREWELL_PATTERN.match(text):
+        return "FAREWELL"
+    if len(text.split()) <= 6 and (NEGATION_PATTERN.match(text) or DISSATISFIED_PATTERN.search(text)):
+        rest = DISSATISFIED_PATTERN.sub(" ", NEGATION_PATTERN.sub(" ", text))
+        # Mixed signals go to the LLM
+        return None if POSITIVE_PATTERN.search(rest) else "DISSATISFIED"
+    return None
+
+
+# (reply to the strategy guide, expected parse_satisfaction result)
+SATISFACTION_SAMPLES = [
+    ("yes, email it to me", "SATISFIED"),
+    ("send it", "SATISFIED"),
+    ("send the guide to my inbox", "SATISFIED"),
+    ("please mail this, no changes", "SATISFIED"),
+    ("looks good, thanks", "SATISFIED"),
+    ("don't email me yet, show me another one", None),
+    ("no need to send it", None),
+    ("send me another strategy", None),
+    ("send me a different one", None),
+    ("can you send me more options", None),
+    ("I need more detail, send me a better guide", None),
+    ("send it again but with more detail", None),
+    ("not good, another one", "DISSATISFIED"),
+    ("bye", "FAREWELL"),
+]
+
+# (reply, expected parse_strategy_selection result for SELECTION_STRATEGIES)
+SELECTION_STRATEGIES = ["Social media ads on Instagram", "Email newsletter campaign", "Local events and pop-ups"]
+SELECTION_SAMPLES = [
+    ("2", 2),
+    ("the first one", 1),
+    ("The last option.", 3),
+    ("strategy three", 3),
+    ("first, what does option 2 involve?", None),
+    ("last year we tried ads, what about 2?", None),
+]
+
+
+if __name__ == "__main__":
+    failures = 0
+    for text, expected in SATISFACTION_SAMPLES:
+        got = parse_satisfaction(text)
+        failures += got != expected
+        print(f"{'ok ' if got == expected else 'BAD'} satisfaction {text!r}: {got} (expected {expected})")
+    for text, expected in SELECTION_SAMPLES:
+        got = parse_strategy_selection(text, SELECTION_STRATEGIES)
+        failures += got != expected
+        print(f"{'ok ' if got == expected else 'BAD'} selection {text!r}: {got} (expected {expected})")
+    assert not failures, f"{failures} sample(s) parsed differently than expected"
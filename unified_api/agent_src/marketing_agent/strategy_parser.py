@@ -0,0 +1,63 @@
+import re
+from typing import Optional
+
+CITATION_PATTERN = re.compile(r'\(Source:\s*\[?(\d+)\]?\)')
+
+
+class StrategyStreamParser:
+    """
+    Incrementally parses the citation chain's output ("1. ... (Source: [n])" per line)
+    while the model is still generating. feed() returns each `**Strategy N:**` line as
+    soon as its source line is complete; `strategies` and `response_lines` end up the
+    same as parsing the full text at once.
+    """
+
+    def __init__(self, source_map: dict[int, str]):
+        self.source_map = source_map
+        self.strategies: list[str] = []
+        self.response_lines: list[str] = []
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> list[dict]:
+        """Consumes a token chunk; returns the strategies completed by it."""
+        self._buffer += chunk
+        completed = []
+        while '\n' in self._buffer:
+            line, self._buffer = self._buffer.split('\n', 1)
+            parsed = self._parse_line(line)
+            if parsed:
+                completed.append(parsed)
+        return completed
+
+    def close(self) -> list[dict]:
+        """Flushes the last line once the stream has ended."""
+        line, self._buffer = self._buffer, ""
+        parsed = self._parse_line(line)
+        return [parsed] if parsed else []
+
+    def _parse_line(self, line: str) -> Optional[dict]:
+        line = line.strip()
+        if not line:
+            return None
+
+        # Check for source citation
+        match = CITATION_PATTERN.search(line)
+        source_url = None
+        if match:
+            source_url = self.source_map.get(int(match.group(1)), "Source not found")
+            # Remove the citation from the text to avoid duplication
+            strategy_text = CITATION_PATTERN.sub('', line).strip()
+        elif len(line) > 10 and line[0].isdigit():
+            # Fallback: If it looks like a strategy but missed citation, include it anyway
+            strategy_text = line
+        else:
+            return None
+
+        # Clean up leading numbers/bullets if present
+        strategy_text = re.sub(r'^\d+\.\s*', '', strategy_text)
+        self.strategies.append(strategy_text)
+        response_line = f"**Strategy {len(self.strategies)}:** {strategy_text}"
+        if source_url:
+            response_line += f"\n*Source: {source_url}*"
+        self.response_lines.append(response_line)
+        return {"index": len(self.strategies), "strategy": strategy_text, "source": source_url, "line": response_line}
@@ -1,5 +1,5 @@
 # src/models.py (New file for Pydantic models)
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from uuid import UUID
 
@@ -10,4 +10,27 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     response: str
     session_id: UUID
-    is_complete: bool  # True if satisfaction reached or session ended
\ No newline at end of file
+    is_complete: bool  # True if satisfaction reached or session ended
+
+class ProductDetailsExtraction(BaseModel):
+    """Structured output of the single-call product detail extraction in gather_product_details."""
+    name: str = Field("unknown", description="Product name, or 'unknown'")
+    features: str = Field("unknown", description="Comma-separated list of features, or 'unknown'")
+    target_audience: str = Field("unknown", description="Who the product is for, or 'unknown'")
+    goals: str = Field("unknown", description="The user's marketing goals, or 'unknown'")
+    follow_up_questions: Optional[str] = Field(
+        None,
+        description="If fewer than three of the fields above are known, 3-4 punchy follow-up questions for the user; otherwise null",
+    )
+
+    @field_validator("name", "features", "target_audience", "goals", mode="before")
+    @classmethod
+    def blank_to_unknown(cls, value):
+        return value.strip() if isinstance(value, str) and value.strip() else "unknown"
+
+    def known_fields_count(self) -> int:
+        return sum(1 for v in (self.name, self.features, self.target_audience, self.goals) if "unknown" not in v.lower())
+
+    def to_product_details(self) -> str:
+        """Renders the fields in the 'Name/Features/Target Audience/Goals' format stored in state."""
+        return f"Name: {self.name}\nFeatures: {self.features}\nTarget Audience: {self.target_audience}\nGoals: {self.goals}"
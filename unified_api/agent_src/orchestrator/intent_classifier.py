@@ -0,0 +1,215 @@
+"""
+Local first-stage intent classifier for router_node.
+
+Keyword/regex rules decide the obvious cases (greetings, yes/no follow-ups, explicit
+marketing requests); a small multinomial Naive Bayes bag-of-words model trained on
+TRAINING_EXAMPLES handles the rest. When neither is confident, classify_intent returns
+None and the router falls back to the LLM.
+
+Run `python -m agent_src.orchestrator.intent_classifier` from unified_api/ to print
+accuracy and latency on BENCHMARK_EXAMPLES (the LLM column needs GROQ_API_KEY).
+"""
+import math
+import re
+from collections import Counter
+from typing import Optional, Sequence
+
+MARKETING = "marketing_agent"
+GENERAL = "general_chat"
+
+GREETING_PATTERN = re.compile(
+    r"^\s*(hi+|hello|hey+|yo|hiya|howdy|greetings|good (morning|afternoon|evening)|"
+    r"who are you|what are you|what can you do|how are you|thanks|thank you|bye|goodbye)\b[\s!.?,]*\w{0,12}[\s!.?]*$",
+    re.IGNORECASE,
+)
+AFFIRMATIVE_PATTERN = re.compile(
+    r"^\s*((yes|yeah|yep|yup|sure|ok|okay|please|absolutely|of course|definitely|go ahead|let'?s do it)\b[\s,!.]*){1,3}$",
+    re.IGNORECASE,
+)
+NEGATIVE_PATTERN = re.compile(r"^\s*(no|nope|nah|not now|no thanks|no thank you)\b[\s!.]*$", re.IGNORECASE)
+# Only phrases that mean marketing on their own; generic words ("market", "grow", "sales",
+# "customers", "audience") are left to the Naive Bayes model and the LLM router
+MARKETING_PATTERN = re.compile(
+    r"\b(marketing|go-to-market|marketing (plan|strateg(y|ies))|(ad|advertising|marketing) campaigns?|"
+    r"promote my|advertis(e|ing) my|seo|social media (marketing|strategy|presence)|brand awareness|"
+    r"influencer marketing|lead generation)\b",
+    re.IGNORECASE,
+)
+# Whole message only: "reset my password" or "a new product line" must not wipe the funnel
+START_OVER_PATTERN = re.compile(
+    r"^\s*(let'?s\s+|please\s+)?(start (over|again|fresh)|restart|reset|begin again|start from scratch|"
+    r"new product|different product|cancel)(\s+please)?\s*[.!]*\s*$",
+    re.IGNORECASE,
+)
+# Words in the assistant's last turn that mean a yes/no answers a marketing question
+MARKETING_CONTEXT_PATTERN = re.compile(r"\b(marketing|strateg\w*|product|campaign|guide)\b", re.IGNORECASE)
+
+NB_CONFIDENCE = 0.9
+
+TRAINING_EXAMPLES = [
+    ("I need help marketing my new app", MARKETING),
+    ("how do I promote my bakery", MARKETING),
+    ("give me some strategies to get more customers", MARKETING),
+    ("I'm launching a skincare brand for teens", MARKETING),
+    ("we sell handmade candles online and want more sales", MARKETING),
+    ("my startup makes project management software for small teams", MARKETING),
+    ("how can I grow my instagram following for my shop", MARKETING),
+    ("I want to get the word out about my podcast", MARKETING),
+    ("help me find ideas to advertise my restaurant", MARKETING),
+    ("our goal is to reach college students with a budgeting tool", MARKETING),
+    ("it's a fitness tracker for runners", MARKETING),
+    ("the target audience is busy parents", MARKETING),
+    ("features include offline mode and dark mode", MARKETING),
+    ("can you suggest ways to attract clients to my consulting business", MARKETING),
+    ("what's the best way to sell more online courses", MARKETING),
+    ("I run a coffee shop and want more foot traffic", MARKETING),
+    ("hello there", GENERAL),
+    ("hi, who are you?", GENERAL),
+    ("what can you do", GENERAL),
+    ("good morning!", GENERAL),
+    ("how are you today", GENERAL),
+    ("tell me a joke", GENERAL),
+    ("what's your name", GENERAL),
+    ("thanks, that's all", GENERAL),
+    ("what is the weather like", GENERAL),
+    ("are you a robot", GENERAL),
+    ("nice to meet you", GENERAL),
+    ("what time is it", GENERAL),
+    ("who made you", GENERAL),
+    ("just saying hi", GENERAL),
+    ("what is the stock market doing today", GENERAL),
+    ("how fast do plants grow", GENERAL),
+    ("how is sales tax calculated", GENERAL),
+]
+
+# (recent assistant message or None, user message, expected route)
+BENCHMARK_EXAMPLES = [
+    (None, "hi", GENERAL),
+    (None, "Hello! Who are you?", GENERAL),
+    (None, "good evening", GENERAL),
+    (None, "what can you do?", GENERAL),
+    (None, "tell me something funny", GENERAL),
+    (None, "how are you doing", GENERAL),
+    (None, "I need a marketing plan for my yoga studio", MARKETING),
+    (None, "how do I promote my new mobile game?", MARKETING),
+    (None, "we make eco-friendly water bottles and want more customers", MARKETING),
+    (None, "I'm launching a newsletter about personal finance", MARKETING),
+    (None, "help me sell my handmade jewelry", MARKETING),
+    (None, "my product is a CRM for dentists", MARKETING),
+    ("Hello! Do you need help with marketing strategies?", "yes", MARKETING),
+    ("Hello! Do you need help with marketing strategies?", "yeah sure", MARKETING),
+    ("Hello! Do you need help with marketing strategies?", "no thanks", GENERAL),
+    ("Shall I proceed with generating strategies based on this?", "ok", MARKETING),
+    ("Which of these strategies resonates with you the most?", "the second one", MARKETING),
+    ("Tell me about your product, target audience and goals!", "it's an app for dog walkers in Berlin", MARKETING),
+    (None, "what's your favourite colour", GENERAL),
+    (None, "thank you!", GENERAL),
+]
+
+
+def _tokenize(text: str) -> list[str]:
+    return re.findall(r"[a-z']+", text.lower())
+
+
+class NaiveBayesIntentModel:
+    """Multinomial Naive Bayes over word counts with Laplace smoothing."""
+
+    def __init__(self, examples: Sequence[tuple[str, str]]):
+        self.word_counts = {label: Counter() for _, label in examples}
+        label_counts = Counter(label for _, label in examples)
+        for text, label in examples:
+            self.word_counts[label].update(_tokenize(text))
+        self.vocab = set().union(*self.word_counts.values())
+        self.totals = {label: sum(counts.values()) for label, counts in self.word_counts.items()}
+        self.log_priors = {label: math.log(n / len(examples)) for label, n in label_counts.items()}
+
+    def predict(self, text: str) -> tuple[str, float]:
+        tokens = [t for t in _tokenize(text) if t in self.vocab]
+        scores = {}
+        for label, counts in self.word_counts.items():
+            denom = self.totals[label] + len(self.vocab)
+            scores[label] = self.log_priors[label] + sum(math.log((counts[t] + 1) / denom) for t in tokens)
+        best = max(scores, key=scores.get)
+        # Softmax over the log scores gives the posterior of the best label
+        norm = sum(math.exp(s - scores[best]) for s in scores.values())
+        return best, 1.0 / norm
+
+
+_model = NaiveBayesIntentModel(TRAINING_EXAMPLES)
+
+
+def is_start_over(user_input: str) -> bool:
+    """True if the user wants to abandon the current marketing funnel."""
+    return bool(START_OVER_PATTERN.match(user_input))
+
+
+def classify_intent(user_input: str, last_ai_message: Optional[str] = None) -> tuple[Optional[str], str]:
+    """
+    Returns (route, reason). route is 'marketing_agent', 'general_chat', or None when
+    the local stage is unsure and the LLM router should decide.
+    """
+    text = user_input.strip()
+    if not text:
+        return GENERAL, "empty"
+
+    if AFFIRMATIVE_PATTERN.match(text) or NEGATIVE_PATTERN.match(text):
+        if last_ai_message and MARKETING_CONTEXT_PATTERN.search(last_ai_message):
+            return (MARKETING if AFFIRMATIVE_PATTERN.match(text) else GENERAL), "follow_up"
+        return None, "follow_up_without_context"
+
+    if GREETING_PATTERN.match(text):
+        return GENERAL, "greeting"
+
+    if MARKETING_PATTERN.search(text):
+        return MARKETING, "marketing_keyword"
+
+    label, confidence = _model.predict(text)
+    if confidence >= NB_CONFIDENCE:
+        return label, "model"
+    return None, "low_confidence"
+
+
+if __name__ == "__main__":
+    import asyncio
+    import os
+    import time
+
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    def local_stage(ai_message, user_message):
+        route, _ = classify_intent(user_message, ai_message)
+        return route
+
+    start = time.perf_counter()
+    local_routes = [local_stage(ai, user) for ai, user, _ in BENCHMARK_EXAMPLES]
+    local_latency = (time.perf_counter() - start) / len(BENCHMARK_EXAMPLES)
+
+    decided = [(r, e) for r, (_, _, e) in zip(local_routes, BENCHMARK_EXAMPLES) if r is not None]
+    print(f"Local stage: decided {len(decided)}/{len(BENCHMARK_EXAMPLES)}, "
+          f"accuracy on decided {sum(r == e for r, e in decided) / max(len(decided), 1):.0%}, "
+          f"avg latency {local_latency * 1000:.3f} ms")
+
+    if os.getenv("GROQ_API_KEY"):
+        from .orchestrator_nodes import router_node, llm_router
+
+        def to_messages(ai, user):
+            return ([AIMessage(content=ai)] if ai else []) + [HumanMessage(content=user)]
+
+        async def run(router):
+            correct, elapsed = 0, 0.0
+            for ai, user, expected in BENCHMARK_EXAMPLES:
+                t = time.perf_counter()
+                result = await router({"messages": to_messages(ai, user)})
+                elapsed += time.perf_counter() - t
+                correct += result["next_agent"] == expected
+            return correct / len(BENCHMARK_EXAMPLES), elapsed / len(BENCHMARK_EXAMPLES)
+
+        routers = [
+            ("LLM only (before)", llm_router),
+            ("local + LLM fallback (after)", lambda state: router_node(state, {})),
+        ]
+        for name, router in routers:
+            accuracy, latency = asyncio.run(run(router))
+            print(f"{name}: accuracy {accuracy:.0%}, avg latency {latency * 1000:.1f} ms")
+    else:
+        print("Set GROQ_API_KEY to benchmark the LLM router for comparison.")
@@ -1,9 +1,15 @@
 from langgraph.graph import StateGraph, END
 from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
 import sqlite3
-from ..config import USE_REDIS, redis_client
+import time
+from ..config import USE_REDIS, redis_client, STICKY_ROUTING_TIMEOUT, CHECKPOINT_CACHE_ENABLED, CHECKPOINT_CACHE_MB
+from ..transcript import transcript_store
+from ..checkpoint_cache import CachedCheckpointSaver
 
-from .orchestrator_nodes import OrchestratorState, router_node, general_chat_node
+from .orchestrator_nodes import OrchestratorState, router_node, general_chat_node, ROUTER_STATS
+from .intent_classifier import is_start_over
 from ..marketing_agent.marketing_graph import workflow as marketing_workflow
 
 # Compile marketing subgraph
@@ -24,16 +30,56 @@ async def call_marketing_agent(state: OrchestratorState) -> dict:
     
     # Return the full result to update the Orchestrator's state
     # This ensures product_details, strategies, etc. are persisted
+    # active_agent keeps follow-up turns ("2", "yes") sticky to the funnel until it completes
+    result["active_agent"] = None if result.get("satisfaction") else "marketing_agent"
+    result["last_turn_at"] = time.time()
     return result
 
+async def archive_transcript(state: OrchestratorState, config: RunnableConfig) -> dict:
+    """
+    Appends this turn's messages to the transcript store. Runs at the end of every turn,
+    before older messages can fall out of the checkpointed message window.
+    """
+    thread_id = config.get("configurable", {}).get("thread_id")
+    messages = state.get("messages") or []
+    if not thread_id or not messages:
+        return {}
+    last_id = state.get("transcript_archived_id")
+    start = next((i + 1 for i, msg in enumerate(messages) if msg.id == last_id), 0)
+    await transcript_store.append(str(thread_id), messages[start:])
+    return {"transcript_archived_id": messages[-1].id}
+
 # Build the Orchestrator Graph
 workflow = StateGraph(OrchestratorState)
 
 workflow.add_node("router", router_node)
 workflow.add_node("general_chat", general_chat_node)
 workflow.add_node("marketing_agent", call_marketing_agent)
+workflow.add_node("archive_transcript", archive_transcript)
 
-workflow.set_entry_point("router")
+def route_entry(state: OrchestratorState) -> str:
+    """
+    Sends sessions with a marketing funnel in progress straight to the marketing agent,
+    skipping the router. "Start over" requests and sessions idle longer than
+    STICKY_ROUTING_TIMEOUT go through the router as usual.
+    """
+    if state.get("active_agent") != "marketing_agent" or state.get("satisfaction"):
+        return "router"
+    if time.time() - (state.get("last_turn_at") or 0) > STICKY_ROUTING_TIMEOUT:
+        return "router"
+    messages = state.get("messages") or []
+    if messages and isinstance(messages[-1], HumanMessage) and is_start_over(messages[-1].content):
+        return "router"
+    ROUTER_STATS["sticky"] += 1
+    return "marketing_agent"
+
+workflow.set_conditional_entry_point(
+    route_entry,
+    {
+        "router": "router",
+        "marketing_agent": "marketing_agent",
+    }
+)
 
 def route_logic(state: OrchestratorState) -> str:
     return state["next_agent"]
@@ -44,15 +90,15 @@ workflow.add_conditional_edges(
     {
         "marketing_agent": "marketing_agent",
         "general_chat": "general_chat",
-        "END": END
+        "END": "archive_transcript"
     }
 )
 
-workflow.add_edge("general_chat", END)
-workflow.add_edge("marketing_agent", END)
-
-workflow.add_edge("general_chat", END)
-workflow.add_edge("marketing_agent", END)
+workflow.add_edge("general_chat", "archive_transcript")
+workflow.add_edge("marketing_agent", "archive_transcript")
+workflow.add_edge("archive_transcript", END)
 
 def compile_workflow(checkpointer=None):
+    if checkpointer is not None and CHECKPOINT_CACHE_ENABLED:
+        checkpointer = CachedCheckpointSaver(checkpointer, max_bytes=CHECKPOINT_CACHE_MB * 1024 * 1024)
     return workflow.compile(checkpointer=checkpointer)
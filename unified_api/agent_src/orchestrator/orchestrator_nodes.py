@@ -2,18 +2,23 @@ from typing import TypedDict, Annotated, Sequence, Literal, Optional
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langgraph.graph.message import add_messages
+from langchain_core.runnables import RunnableConfig
 from langchain_groq import ChatGroq
 import os
-from ..config import GROQ_API_KEY
+from ..config import GROQ_API_KEY, STREAM_TAG, CONTEXT_POLICIES
+from ..transcript import add_messages_window
+from ..context_manager import truncate_to_tokens, prompt_token_counter
+from ..llm_cache import cached_chain
+from .intent_classifier import classify_intent, is_start_over
+from ..marketing_agent.marketing_nodes import guide_prefetcher, strategy_speculator
 
 if GROQ_API_KEY:
     os.environ["GROQ_API_KEY"] = GROQ_API_KEY
 
-llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.5)
+llm = ChatGroq(model="llama-3.1-8b-instant", temperature=0.5, callbacks=[prompt_token_counter])
 
 class OrchestratorState(TypedDict):
-    messages: Annotated[Sequence[BaseMessage], add_messages]
+    messages: Annotated[Sequence[BaseMessage], add_messages_window]
     next_agent: Literal["marketing_agent", "general_chat", "END"]
     # Marketing Agent State Fields
     product_details: Optional[str]
@@ -23,11 +28,35 @@ class OrchestratorState(TypedDict):
     guided: bool
     user_email: Optional[str]
     strategy_guide: Optional[str]
+    # Sticky routing: the agent that owns the conversation and when it last ran
+    active_agent: Optional[str]
+    last_turn_at: Optional[float]
+    # Rolling conversation summary maintained by the marketing agent
+    context_summary: Optional[str]
+    context_summary_upto: Optional[str]
+    # Id of the last message written to the transcript store
+    transcript_archived_id: Optional[str]
 
-def router_node(state: OrchestratorState) -> dict:
+# Counts how each routing decision was made (exposed via /api/agent/metrics)
+# sticky: turns that bypassed the router because a marketing funnel was in progress
+# start_over: funnels reset by the user
+ROUTER_STATS = {"local": 0, "llm": 0, "sticky": 0, "start_over": 0}
+
+# Clears the marketing funnel so the next marketing turn starts from product details
+FUNNEL_RESET = {
+    "product_details": None,
+    "strategies": None,
+    "selected_strategy": None,
+    "satisfaction": False,
+    "guided": False,
+    "strategy_guide": None,
+}
+
+async def router_node(state: OrchestratorState, config: RunnableConfig) -> dict:
     """
     Analyzes the user's input to determine the intent.
     Routes to 'marketing_agent' or 'general_chat'.
+    Obvious cases are decided by the local classifier; the LLM only runs when it is unsure.
     """
     messages = state["messages"]
     if not messages:
@@ -37,10 +66,37 @@ def router_node(state: OrchestratorState) -> dict:
     if not isinstance(last_message, HumanMessage):
         return {"next_agent": "general_chat"}
 
+    if is_start_over(last_message.content):
+        ROUTER_STATS["start_over"] += 1
+        print("--- Router: user asked to start over, resetting marketing funnel ---")
+        thread_id = config.get("configurable", {}).get("thread_id")
+        for speculative in (guide_prefetcher, strategy_speculator):
+            if speculative and thread_id:
+                speculative.cancel(thread_id)
+        return {**FUNNEL_RESET, "next_agent": "marketing_agent"}
+
+    last_ai_message = next((msg.content for msg in reversed(messages[:-1]) if isinstance(msg, AIMessage)), None)
+    route, reason = classify_intent(last_message.content, last_ai_message)
+    if route:
+        ROUTER_STATS["local"] += 1
+        print(f"--- Router decided locally ({reason}): {route} ---")
+        return {"next_agent": route}
+
+    ROUTER_STATS["llm"] += 1
+    return await llm_router(state)
+
+async def llm_router(state: OrchestratorState) -> dict:
+    """
+    Classifies the intent of the last user message with the LLM.
+    """
+    messages = state["messages"]
+
     # Get the last few messages for context (e.g., last 3)
     # This helps if the user says "yes" to a previous question
     recent_messages = messages[-3:]
-    conversation_context = "\n".join([f"{msg.type}: {msg.content}" for msg in recent_messages])
+    # Each message is capped, so one pasted strategy guide doesn't blow up the routing prompt
+    message_tokens = CONTEXT_POLICIES["router"]["message_tokens"]
+    conversation_context = "\n".join([f"{msg.type}: {truncate_to_tokens(msg.content, message_tokens)}" for msg in recent_messages])
 
     prompt = ChatPromptTemplate.from_messages([
         ("system", """You are an intelligent router for an AI Agent system.
@@ -54,15 +110,15 @@ def router_node(state: OrchestratorState) -> dict:
         Based on the last user message, output ONLY one word: 'marketing' or 'general'."""),
     ])
     
-    chain = prompt | llm | StrOutputParser()
-    intent = chain.invoke({"context": conversation_context}).strip().lower()
+    chain = cached_chain("router", prompt, llm)
+    intent = (await chain.ainvoke({"context": conversation_context})).strip().lower()
     
     if "marketing" in intent:
         return {"next_agent": "marketing_agent"}
     else:
         return {"next_agent": "general_chat"}
 
-def general_chat_node(state: OrchestratorState) -> dict:
+async def general_chat_node(state: OrchestratorState) -> dict:
     """
     Handles general small talk and greetings.
     """
@@ -72,7 +128,7 @@ def general_chat_node(state: OrchestratorState) -> dict:
         ("human", "{user_input}"),
     ])
     
-    chain = prompt | llm | StrOutputParser()
-    response = chain.invoke({"user_input": messages[-1].content})
+    chain = (prompt | llm | StrOutputParser()).with_config(tags=[STREAM_TAG])
+    response = await chain.ainvoke({"user_input": messages[-1].content})
     
-    return {"messages": [AIMessage(content=response)], "next_agent": "END"}
+    return {"messages": [AIMessage(content=response)], "next_agent": "END", "active_agent": None}
@@ -0,0 +1,475 @@
+"""
+Async checkpointer on plain Redis data structures, for sharing sessions between API workers.
+
+langgraph-checkpoint-redis needs the RediSearch and RedisJSON modules (Redis Stack);
+this saver only uses hashes, sets and sorted sets, so it runs on any Redis server
+(and on fakeredis). Key layout under `prefix`:
+
+    {prefix}:{thread}:namespaces              SET   checkpoint namespaces of a thread
+    {prefix}:{thread}:{ns}:index              ZSET  checkpoint ids (score 0, ordered by id)
+    {prefix}:{thread}:{ns}:cp:{id}            HASH  parent, type, checkpoint, metadata
+    {prefix}:{thread}:{ns}:w:{id}             HASH  "{task_id}:{idx}" -> packed pending write
+
+Checkpoint ids are uuid6, so lexicographic order in the index is creation order.
+Each namespace keeps its newest `keep_last` checkpoints: once TRIM_SLACK more have piled
+up, the older ids are removed from the index together with their checkpoint and writes
+hashes, so no index outlives the hashes it points to.
+Each aput/aput_writes sends all of its commands in one pipelined MULTI/EXEC round trip,
+and all savers in a process share one BlockingConnectionPool, which waits for a free
+connection instead of failing when every connection is busy.
+
+Selected with CHECKPOINTER_BACKEND=redis (REDIS_HOST, REDIS_POOL_SIZE, ...). With
+CHECKPOINT_REDIS_TTL set, in place of the SQLite retention loop, every write pushes back the
+expiry of the thread's namespace set and index, the new checkpoint and its parent, so a session
+expires CHECKPOINT_REDIS_TTL seconds after its last write. Older checkpoints still expire that
+long after they were written; alist skips index entries whose hashes are gone.
+Run `python -m agent_src.redis_checkpointer` from unified_api/ to check the saver against
+fakeredis (from requirements-dev.txt), or pass `--url redis://...` for a real server.
+"""
+import json
+import random
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional, Sequence
+
+import ormsgpack
+import redis.asyncio as aioredis
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+from langgraph.checkpoint.serde.base import SerializerProtocol
+
+# Checkpoints fetched per pipeline while listing
+LIST_CHUNK = 50
+# Checkpoints allowed past keep_last before a namespace is trimmed, so trimming
+# costs one extra round trip every TRIM_SLACK writes instead of on every write
+TRIM_SLACK = 10
+
+
+def create_pool(
+    host: str = "localhost",
+    port: int = 6379,
+    db: int = 0,
+    password: Optional[str] = None,
+    max_connections: int = 20,
+    pool_timeout: float = 5.0,
+    socket_timeout: float = 5.0,
+    connect_timeout: float = 2.0,
+    **connection_kwargs,
+) -> aioredis.BlockingConnectionPool:
+    """Connection pool shared by every saver (and worker task) in the process."""
+    return aioredis.BlockingConnectionPool(
+        host=host,
+        port=port,
+        db=db,
+        password=password,
+        max_connections=max_connections,
+        timeout=pool_timeout,
+        socket_timeout=socket_timeout,
+        socket_connect_timeout=connect_timeout,
+        health_check_interval=30,
+        **connection_kwargs,
+    )
+
+
+class AsyncRedisCheckpointSaver(BaseCheckpointSaver):
+    """Checkpointer storing each checkpoint and its pending writes as Redis hashes."""
+
+    def __init__(
+        self,
+        client: aioredis.Redis,
+        prefix: str = "checkpoint",
+        ttl_seconds: Optional[int] = None,
+        keep_last: Optional[int] = 20,
+        serde: Optional[SerializerProtocol] = None,
+    ):
+        super().__init__(serde=serde)
+        self.client = client
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds or None
+        self.keep_last = keep_last or None
+        self._stats = {"round_trips": 0, "commands": 0, "trimmed": 0}
+
+    @classmethod
+    @asynccontextmanager
+    async def from_pool(
+        cls, pool: aioredis.ConnectionPool, **kwargs
+    ) -> AsyncIterator["AsyncRedisCheckpointSaver"]:
+        """Saver on a client over `pool`; the pool is disconnected on exit."""
+        client = aioredis.Redis(connection_pool=pool)
+        try:
+            yield cls(client, **kwargs)
+        finally:
+            await client.aclose()
+            await pool.disconnect()
+
+    # --- Keys ---
+
+    def _namespaces_key(self, thread_id: str) -> str:
+        return f"{self.prefix}:{thread_id}:namespaces"
+
+    def _index_key(self, thread_id: str, checkpoint_ns: str) -> str:
+        return f"{self.prefix}:{thread_id}:{checkpoint_ns}:index"
+
+    def _checkpoint_key(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"{self.prefix}:{thread_id}:{checkpoint_ns}:cp:{checkpoint_id}"
+
+    def _writes_key(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> str:
+        return f"{self.prefix}:{thread_id}:{checkpoint_ns}:w:{checkpoint_id}"
+
+    async def _execute(self, pipe) -> list:
+        self._stats["round_trips"] += 1
+        self._stats["commands"] += len(pipe)
+        return await pipe.execute()
+
+    def _expire(self, pipe, *keys: str):
+        if self.ttl_seconds:
+            for key in keys:
+                pipe.expire(key, self.ttl_seconds)
+
+    async def setup(self):
+        """Checks the connection; there is no schema to create."""
+        await self.client.ping()
+
+    # --- Writes ---
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, serialized_checkpoint = self.serde.dumps_typed(checkpoint)
+        serialized_metadata = json.dumps(get_checkpoint_metadata(config, metadata), ensure_ascii=False)
+        checkpoint_key = self._checkpoint_key(thread_id, checkpoint_ns, checkpoint["id"])
+        index_key = self._index_key(thread_id, checkpoint_ns)
+
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hset(checkpoint_key, mapping={
+            "parent": config["configurable"].get("checkpoint_id") or "",
+            "type": type_,
+            "checkpoint": serialized_checkpoint,
+            "metadata": serialized_metadata,
+        })
+        pipe.zadd(index_key, {checkpoint["id"]: 0})
+        pipe.sadd(self._namespaces_key(thread_id), checkpoint_ns)
+        self._expire(pipe, checkpoint_key, index_key, self._namespaces_key(thread_id))
+        if parent_id := config["configurable"].get("checkpoint_id"):
+            # The parent (and its writes) may be read back when this checkpoint is resumed or replayed
+            self._expire(
+                pipe,
+                self._checkpoint_key(thread_id, checkpoint_ns, parent_id),
+                self._writes_key(thread_id, checkpoint_ns, parent_id),
+            )
+        if self.keep_last:
+            # Ids past the newest keep_last, read after the ZADD in the same transaction
+            pipe.zrange(index_key, 0, -(self.keep_last + 1))
+        results = await self._execute(pipe)
+        if self.keep_last and len(results[-1]) >= TRIM_SLACK:
+            await self._trim(thread_id, checkpoint_ns, [i.decode() for i in results[-1]])
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        writes_key = self._writes_key(thread_id, checkpoint_ns, config["configurable"]["checkpoint_id"])
+        # Special channels (errors, interrupts) overwrite; regular writes keep the first value,
+        # matching the INSERT OR REPLACE / INSERT OR IGNORE split in the SQLite savers
+        overwrite = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+
+        pipe = self.client.pipeline(transaction=True)
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            packed = ormsgpack.packb([task_id, task_path, idx, channel, *self.serde.dumps_typed(value)])
+            if overwrite:
+                pipe.hset(writes_key, f"{task_id}:{idx}", packed)
+            else:
+                pipe.hsetnx(writes_key, f"{task_id}:{idx}", packed)
+        self._expire(pipe, writes_key)
+        await self._execute(pipe)
+
+    async def _trim(self, thread_id: str, checkpoint_ns: str, checkpoint_ids: list[str]):
+        """Drops old checkpoints of one namespace: hashes and index entries in one transaction."""
+        pipe = self.client.pipeline(transaction=True)
+        keys = []
+        for checkpoint_id in checkpoint_ids:
+            keys.append(self._checkpoint_key(thread_id, checkpoint_ns, checkpoint_id))
+            keys.append(self._writes_key(thread_id, checkpoint_ns, checkpoint_id))
+        pipe.delete(*keys)
+        pipe.zrem(self._index_key(thread_id, checkpoint_ns), *checkpoint_ids)
+        await self._execute(pipe)
+        self._stats["trimmed"] += len(checkpoint_ids)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        thread_id = str(thread_id)
+        namespaces = [ns.decode() for ns in await self.client.smembers(self._namespaces_key(thread_id))]
+        pipe = self.client.pipeline(transaction=False)
+        for checkpoint_ns in namespaces:
+            pipe.zrange(self._index_key(thread_id, checkpoint_ns), 0, -1)
+        id_lists = await self._execute(pipe) if namespaces else []
+
+        pipe = self.client.pipeline(transaction=True)
+        for checkpoint_ns, ids in zip(namespaces, id_lists):
+            keys = [self._index_key(thread_id, checkpoint_ns)]
+            for checkpoint_id in (i.decode() for i in ids):
+                keys.append(self._checkpoint_key(thread_id, checkpoint_ns, checkpoint_id))
+                keys.append(self._writes_key(thread_id, checkpoint_ns, checkpoint_id))
+            pipe.delete(*keys)
+        pipe.delete(self._namespaces_key(thread_id))
+        await self._execute(pipe)
+
+    # --- Reads ---
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = get_checkpoint_id(config)
+        if not checkpoint_id:
+            self._stats["round_trips"] += 1
+            self._stats["commands"] += 1
+            latest = await self.client.zrevrangebylex(self._index_key(thread_id, checkpoint_ns), "+", "-", start=0, num=1)
+            if not latest:
+                return None
+            checkpoint_id = latest[0].decode()
+        tuples = await self._load([(thread_id, checkpoint_ns, checkpoint_id)])
+        return tuples[0]
+
+    async def _load(self, refs: list[tuple[str, str, str]]) -> list[Optional[CheckpointTuple]]:
+        """Fetches checkpoints and their pending writes in one pipeline."""
+        pipe = self.client.pipeline(transaction=False)
+        for thread_id, checkpoint_ns, checkpoint_id in refs:
+            pipe.hgetall(self._checkpoint_key(thread_id, checkpoint_ns, checkpoint_id))
+            pipe.hvals(self._writes_key(thread_id, checkpoint_ns, checkpoint_id))
+        results = await self._execute(pipe)
+        return [
+            self._to_tuple(ref, results[2 * i], results[2 * i + 1])
+            for i, ref in enumerate(refs)
+        ]
+
+    def _to_tuple(self, ref: tuple[str, str, str], data: dict, writes: list) -> Optional[CheckpointTuple]:
+        if not data:
+            return None
+        thread_id, checkpoint_ns, checkpoint_id = ref
+        parent_id = data[b"parent"].decode()
+        pending = sorted((ormsgpack.unpackb(w) for w in writes), key=lambda w: writes_sort_key(w[1], w[0], w[2]))
+        return CheckpointTuple(
+            {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            self.serde.loads_typed((data[b"type"].decode(), data[b"checkpoint"])),
+            json.loads(data[b"metadata"]),
+            (
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id
+                else None
+            ),
+            [(task_id, channel, self.serde.loads_typed((type_, value))) for task_id, _, _, channel, type_, value in pending],
+        )
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        configurable = (config or {}).get("configurable", {})
+        if configurable.get("thread_id") is not None:
+            thread_ids = [str(configurable["thread_id"])]
+        else:
+            # No global thread registry (it would never shrink): find threads by their namespace sets.
+            # Only used by admin tooling, so a SCAN is acceptable here.
+            suffix = ":namespaces"
+            thread_ids = [
+                key.decode()[len(self.prefix) + 1:-len(suffix)]
+                async for key in self.client.scan_iter(match=f"{self.prefix}:*{suffix}", count=500)
+            ]
+
+        # (thread_id, checkpoint_ns) pairs to list
+        pairs = []
+        for thread_id in thread_ids:
+            if "checkpoint_ns" in configurable:
+                pairs.append((thread_id, configurable["checkpoint_ns"]))
+            else:
+                namespaces = await self.client.smembers(self._namespaces_key(thread_id))
+                pairs.extend((thread_id, ns.decode()) for ns in namespaces)
+        if not pairs:
+            return
+
+        upper = f"({before['configurable']['checkpoint_id']}" if before and get_checkpoint_id(before) else "+"
+        pipe = self.client.pipeline(transaction=False)
+        for thread_id, checkpoint_ns in pairs:
+            pipe.zrevrangebylex(self._index_key(thread_id, checkpoint_ns), upper, "-")
+        id_lists = await self._execute(pipe)
+
+        refs = [
+            (thread_id, checkpoint_ns, checkpoint_id.decode())
+            for (thread_id, checkpoint_ns), ids in zip(pairs, id_lists)
+            for checkpoint_id in ids
+        ]
+        if wanted_id := configurable.get("checkpoint_id"):
+            refs = [ref for ref in refs if ref[2] == wanted_id]
+        refs.sort(key=lambda ref: ref[2], reverse=True)
+
+        yielded = 0
+        for start in range(0, len(refs), LIST_CHUNK):
+            for item in await self._load(refs[start:start + LIST_CHUNK]):
+                if item is None:
+                    continue
+                if filter and any(item.metadata.get(k) != v for k, v in filter.items()):
+                    continue
+                yield item
+                yielded += 1
+                if limit is not None and yielded >= limit:
+                    return
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        next_v = current_v + 1
+        next_h = random.random()
+        return f"{next_v:032}.{next_h:016}"
+
+    def stats(self) -> dict:
+        pool = self.client.connection_pool
+        return {
+            **self._stats,
+            "commands_per_round_trip": self._stats["commands"] / self._stats["round_trips"] if self._stats["round_trips"] else 0.0,
+            "pool_max_connections": pool.max_connections,
+        }
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    import time
+    import uuid
+
+    from langchain_core.messages import AIMessage, HumanMessage
+    from langgraph.checkpoint.base import empty_checkpoint
+    from langgraph.checkpoint.base.id import uuid6
+
+    parser = argparse.ArgumentParser(description="Check the Redis checkpointer against fakeredis or a real server.")
+    parser.add_argument("--url", help="redis:// URL of a real server (default: in-process fakeredis)")
+    parser.add_argument("--sessions", type=int, default=50)
+    args = parser.parse_args()
+
+    def open_pool():
+        if args.url:
+            return aioredis.BlockingConnectionPool.from_url(args.url, max_connections=20)
+        import fakeredis
+
+        return aioredis.BlockingConnectionPool(
+            connection_class=fakeredis.FakeAsyncRedisConnection, server=fakeredis.FakeServer(), max_connections=20
+        )
+
+    async def main():
+        prefix = f"selfcheck-{uuid.uuid4().hex[:8]}"
+        async with AsyncRedisCheckpointSaver.from_pool(open_pool(), prefix=prefix) as saver:
+            await saver.setup()
+            root = {"configurable": {"thread_id": "t1", "checkpoint_ns": ""}}
+            ids = []
+            config = root
+            for step in range(3):
+                checkpoint = empty_checkpoint()
+                checkpoint["id"] = str(uuid6(clock_seq=step))
+                checkpoint["channel_values"] = {"messages": [HumanMessage(content=f"hi {step}", id=f"h{step}")]}
+                config = await saver.aput(config, checkpoint, {"source": "loop", "step": step}, {})
+                ids.append(checkpoint["id"])
+            await saver.aput_writes(config, [("messages", [AIMessage(content="a", id="a")]), ("route", "END")], task_id="task-b")
+            await saver.aput_writes(config, [("messages", "first")], task_id="task-a")
+            await saver.aput_writes(config, [("messages", "ignored")], task_id="task-a")
+            await saver.aput({"configurable": {"thread_id": "t1", "checkpoint_ns": "sub:1"}}, empty_checkpoint(), {}, {})
+
+            latest = await saver.aget_tuple(root)
+            assert latest.config["configurable"]["checkpoint_id"] == ids[-1]
+            assert latest.parent_config["configurable"]["checkpoint_id"] == ids[-2]
+            assert latest.checkpoint["channel_values"]["messages"][0].content == "hi 2"
+            assert [(t, c) for t, c, _ in latest.pending_writes] == [("task-a", "messages"), ("task-b", "messages"), ("task-b", "route")]
+            assert latest.pending_writes[0][2] == "first"
+            assert (await saver.aget_tuple({"configurable": {**root["configurable"], "checkpoint_id": ids[0]}})).metadata["step"] == 0
+
+            listed = [item.config["configurable"]["checkpoint_id"] async for item in saver.alist(root)]
+            assert listed == ids[::-1]
+            assert len([item async for item in saver.alist({"configurable": {"thread_id": "t1"}})]) == 4
+            assert len([item async for item in saver.alist(root, before={"configurable": {"checkpoint_id": ids[-1]}}, limit=1)]) == 1
+            assert [item.metadata["step"] async for item in saver.alist(None, filter={"step": 1})] == [1]
+
+            await saver.adelete_thread("t1")
+            assert await saver.aget_tuple(root) is None
+            assert not await saver.client.keys(f"{prefix}:*")
+            print("Round trip, pending writes, listing and delete OK")
+
+            # Old checkpoints are trimmed with their hashes once TRIM_SLACK pile up past keep_last
+            saver.keep_last = 5
+            config = root
+            for step in range(5 + TRIM_SLACK):
+                checkpoint = empty_checkpoint()
+                checkpoint["id"] = str(uuid6(clock_seq=step))
+                config = await saver.aput(config, checkpoint, {"step": step}, {})
+                await saver.aput_writes(config, [("messages", "x")], task_id="task")
+            assert [item.metadata["step"] async for item in saver.alist(root)] == list(range(14, 9, -1))
+            assert len(await saver.client.keys(f"{prefix}:t1:*")) == 2 + 2 * 5
+            assert saver.stats()["trimmed"] == TRIM_SLACK
+            await saver.adelete_thread("t1")
+            saver.keep_last = 20
+            print("Keep-last trimming OK")
+
+            # A write pushes back the expiry of its parent as well as its own keys
+            saver.ttl_seconds = 3600
+            first = await saver.aput(root, empty_checkpoint(), {}, {})
+            parent_key = saver._checkpoint_key("t1", "", first["configurable"]["checkpoint_id"])
+            await saver.client.expire(parent_key, 60)
+            await saver.aput(first, empty_checkpoint(), {}, {})
+            assert await saver.client.ttl(parent_key) > 60
+            await saver.adelete_thread("t1")
+            saver.ttl_seconds = None
+            print("TTL refresh OK")
+
+            # One pipelined round trip per aput / aput_writes
+            saver._stats = {"round_trips": 0, "commands": 0, "trimmed": 0}
+
+            async def session(i):
+                config = {"configurable": {"thread_id": f"s{i}", "checkpoint_ns": ""}}
+                for step in range(10):
+                    checkpoint = empty_checkpoint()
+                    checkpoint["id"] = str(uuid6(clock_seq=step))
+                    config = await saver.aput(config, checkpoint, {"step": step}, {})
+                    await saver.aput_writes(config, [("messages", "x")], task_id=f"task-{step}")
+
+            t = time.perf_counter()
+            await asyncio.gather(*(session(i) for i in range(args.sessions)))
+            elapsed = time.perf_counter() - t
+            stats = saver.stats()
+            print(f"{args.sessions} sessions x 10 steps: {args.sessions * 10 / elapsed:.0f} checkpoints/s, "
+                  f"{stats['round_trips']} round trips for {stats['commands']} commands")
+            for i in range(args.sessions):
+                await saver.adelete_thread(f"s{i}")
+
+    asyncio.run(main())
@@ -0,0 +1,146 @@
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def normalize_query(query: str) -> str:
+    """Normalizes a search query so trivially different spellings share a cache entry."""
+    query = query.strip().strip('"\'').lower()
+    query = re.sub(r'[^\w\s]', ' ', query)
+    return re.sub(r'\s+', ' ', query).strip()
+
+
+class CachedSearchWrapper:
+    """
+    Two-tier cache in front of a search wrapper exposing `results(query, max_results)`
+    (e.g. DuckDuckGoSearchAPIWrapper).
+
+    - Memory tier: LRU of the most recent `memory_entries` queries.
+    - Disk tier: SQLite table shared across restarts/workers, with TTL and
+      eviction of least recently used rows once it exceeds `max_bytes`.
+
+    Methods are synchronous because search_web() runs the wrapper in a worker thread.
+    """
+
+    def __init__(
+        self,
+        wrapper,
+        db_path: Optional[str] = "search_cache.sqlite",
+        ttl_seconds: int = 24 * 3600,
+        memory_entries: int = 256,
+        max_bytes: int = 50 * 1024 * 1024,
+    ):
+        self.wrapper = wrapper
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self._memory: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        self._conn = None
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_accessed ON search_cache (accessed_at)")
+            self._conn.commit()
+
+    @staticmethod
+    def _key(query: str, max_results: int) -> str:
+        return f"{max_results}:{normalize_query(query)}"
+
+    def results(self, query: str, max_results: int = 5, **kwargs) -> list[dict]:
+        key = self._key(query, max_results)
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[0] < self.ttl_seconds:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return entry[1]
+
+            cached = self._disk_get(key, now)
+            if cached is not None:
+                self._stats["disk_hits"] += 1
+                self._memory_put(key, cached[0], cached[1])
+                return cached[1]
+
+            self._stats["misses"] += 1
+
+        results = self.wrapper.results(query, max_results=max_results, **kwargs)
+
+        # Don't cache empty results, they are usually a transient rate limit
+        if results:
+            with self._lock:
+                self._memory_put(key, now, results)
+                self._disk_put(key, now, results)
+        return results
+
+    def _memory_put(self, key: str, created_at: float, results: list[dict]):
+        self._memory[key] = (created_at, results)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str, now: float):
+        if not self._conn:
+            return None
+        row = self._conn.execute("SELECT value, created_at FROM search_cache WHERE key = ?", (key,)).fetchone()
+        if not row:
+            return None
+        if now - row[1] >= self.ttl_seconds:
+            self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+            self._conn.commit()
+            return None
+        self._conn.execute("UPDATE search_cache SET accessed_at = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        return row[1], json.loads(row[0])
+
+    def _disk_put(self, key: str, now: float, results: list[dict]):
+        if not self._conn:
+            return
+        value = json.dumps(results)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO search_cache (key, value, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value), now, now),
+        )
+        self._evict(now)
+        self._conn.commit()
+
+    def _evict(self, now: float):
+        """Drops expired rows, then least recently used rows until under max_bytes."""
+        cur = self._conn.execute("DELETE FROM search_cache WHERE created_at <= ?", (now - self.ttl_seconds,))
+        self._stats["evictions"] += cur.rowcount
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM search_cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM search_cache ORDER BY accessed_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM search_cache WHERE key = ?", (key,))
+            total -= size
+            self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            if self._conn:
+                row = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM search_cache").fetchone()
+                stats["disk_entries"], stats["disk_bytes"] = row
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        # Every hit is an outbound search we didn't make
+        stats["searches_saved"] = stats["memory_hits"] + stats["disk_hits"]
+        return stats
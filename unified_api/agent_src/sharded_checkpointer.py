@@ -0,0 +1,200 @@
+"""
+Checkpoint storage split across N SQLite files by thread_id.
+
+Each thread lives entirely on one shard, chosen by a consistent hash ring, so sessions
+on different shards never contend for the same SQLite write lock. ShardedSaver is a
+regular checkpointer and plugs into compile_workflow(checkpointer) unchanged; listing
+without a thread_id fans out to every shard and merges the results.
+
+Changing the shard count only moves the threads whose ring position changed (about
+1/N of them when adding a shard). Move them while the API is stopped:
+
+    python -m agent_src.sharded_checkpointer --from-shards 4 --to-shards 8
+
+Selected with CHECKPOINTER_BACKEND=sharded (CHECKPOINT_SHARDS, CHECKPOINT_SHARD_PATTERN).
+"""
+import asyncio
+import bisect
+import hashlib
+import heapq
+import os
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+)
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+from .sqlite_checkpointer import TunedSqliteSaver
+
+
+def _hash(key: str) -> int:
+    return int(hashlib.md5(key.encode("utf-8")).hexdigest()[:16], 16)
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes for an even spread across shards."""
+
+    def __init__(self, nodes: Sequence[str], vnodes: int = 128):
+        self._ring = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(vnodes))
+        self._keys = [h for h, _ in self._ring]
+
+    def node_for(self, key: str) -> str:
+        index = bisect.bisect(self._keys, _hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+def shard_name(index: int) -> str:
+    # Ring positions depend on the name only, so adding shard-4 leaves shards 0-3 in place
+    return f"shard-{index}"
+
+
+class ShardedSaver(BaseCheckpointSaver):
+    """Routes each thread's checkpoints to one of several savers."""
+
+    def __init__(self, shards: Sequence[BaseCheckpointSaver]):
+        super().__init__(serde=shards[0].serde)
+        self.shards = list(shards)
+        self._by_name = {shard_name(i): shard for i, shard in enumerate(self.shards)}
+        self.ring = HashRing(list(self._by_name))
+
+    @classmethod
+    @asynccontextmanager
+    async def from_pattern(cls, pattern: str, shards: int, **saver_kwargs) -> AsyncIterator["ShardedSaver"]:
+        """Opens `shards` TunedSqliteSavers at pattern.format(0..shards-1)."""
+        async with AsyncExitStack() as stack:
+            savers = [
+                await stack.enter_async_context(TunedSqliteSaver.from_path(pattern.format(i), **saver_kwargs))
+                for i in range(shards)
+            ]
+            yield cls(savers)
+
+    def shard_for(self, config: RunnableConfig) -> BaseCheckpointSaver:
+        return self._by_name[self.ring.node_for(str(config["configurable"]["thread_id"]))]
+
+    async def setup(self):
+        await asyncio.gather(*(shard.setup() for shard in self.shards if hasattr(shard, "setup")))
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await self.shard_for(config).aget_tuple(config)
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await self.shard_for(config).aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self.shard_for(config).aput_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.shard_for({"configurable": {"thread_id": thread_id}}).adelete_thread(thread_id)
+
+    async def aget_delta_channel_history(self, *, config: RunnableConfig, channels: Sequence[str]):
+        return await self.shard_for(config).aget_delta_channel_history(config=config, channels=channels)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        if config and config.get("configurable", {}).get("thread_id") is not None:
+            async for item in self.shard_for(config).alist(config, filter=filter, before=before, limit=limit):
+                yield item
+            return
+
+        # No thread_id: ask every shard (each returns newest first) and merge by checkpoint id
+        async def collect(shard):
+            return [item async for item in shard.alist(config, filter=filter, before=before, limit=limit)]
+
+        per_shard = await asyncio.gather(*(collect(shard) for shard in self.shards))
+        merged = heapq.merge(*per_shard, key=lambda item: item.config["configurable"]["checkpoint_id"], reverse=True)
+        for count, item in enumerate(merged):
+            if limit is not None and count >= limit:
+                break
+            yield item
+
+    def get_next_version(self, current, channel):
+        return self.shards[0].get_next_version(current, channel)
+
+    def stats(self) -> dict:
+        return {
+            "shards": len(self.shards),
+            "per_shard": [shard.stats() if hasattr(shard, "stats") else {} for shard in self.shards],
+        }
+
+
+CHECKPOINT_COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata"
+WRITE_COLUMNS = "thread_id, checkpoint_ns, checkpoint_id, task_id, task_path, idx, channel, type, value"
+
+
+async def rebalance(pattern: str, from_shards: int, to_shards: int) -> dict:
+    """
+    Moves every thread to the shard the `to_shards` ring assigns it. Reads shard files
+    0..max(from, to)-1; files beyond `to_shards` end up empty and can be deleted.
+    Not safe while the API is serving requests.
+    """
+    ring = HashRing([shard_name(i) for i in range(to_shards)])
+    moved = {"threads": 0, "checkpoints": 0, "writes": 0}
+    async with AsyncExitStack() as stack:
+        savers = []
+        for i in range(max(from_shards, to_shards)):
+            os.makedirs(os.path.dirname(os.path.abspath(pattern.format(i))), exist_ok=True)
+            saver = await stack.enter_async_context(AsyncSqliteSaver.from_conn_string(pattern.format(i)))
+            await saver.setup()
+            savers.append(saver)
+
+        for index, source in enumerate(savers):
+            async with source.conn.execute("SELECT DISTINCT thread_id FROM checkpoints") as cur:
+                thread_ids = [row[0] for row in await cur.fetchall()]
+            for thread_id in thread_ids:
+                target_index = int(ring.node_for(thread_id).split("-")[1])
+                if target_index == index:
+                    continue
+                target = savers[target_index]
+                for table, columns in (("checkpoints", CHECKPOINT_COLUMNS), ("writes", WRITE_COLUMNS)):
+                    async with source.conn.execute(f"SELECT {columns} FROM {table} WHERE thread_id = ?", (thread_id,)) as cur:
+                        rows = await cur.fetchall()
+                    placeholders = ", ".join("?" * len(columns.split(", ")))
+                    await target.conn.executemany(f"INSERT OR REPLACE INTO {table} ({columns}) VALUES ({placeholders})", rows)
+                    moved[table] += len(rows)
+                # Commit on the target before deleting, so a crash leaves a duplicate rather than a loss
+                await target.conn.commit()
+                await source.conn.execute("DELETE FROM checkpoints WHERE thread_id = ?", (thread_id,))
+                await source.conn.execute("DELETE FROM writes WHERE thread_id = ?", (thread_id,))
+                await source.conn.commit()
+                moved["threads"] += 1
+    return moved
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from .config import CHECKPOINT_SHARD_PATTERN
+
+    parser = argparse.ArgumentParser(description="Move threads between checkpoint shards after changing the shard count.")
+    parser.add_argument("--pattern", default=CHECKPOINT_SHARD_PATTERN, help="shard file pattern with a {} placeholder")
+    parser.add_argument("--from-shards", type=int, required=True)
+    parser.add_argument("--to-shards", type=int, required=True)
+    args = parser.parse_args()
+
+    result = asyncio.run(rebalance(args.pattern, args.from_shards, args.to_shards))
+    print(f"Moved {result['threads']} threads ({result['checkpoints']} checkpoints, {result['writes']} writes)")
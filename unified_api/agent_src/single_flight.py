@@ -0,0 +1,128 @@
+"""
+One graph run at a time per session, and at most one run per request.
+
+- SessionGate: a FIFO lock per thread_id. Turns for the same session queue up behind
+  the running one instead of racing on its checkpoint; more than `max_queued` waiting
+  turns are rejected with SessionBusy.
+- IdempotencyStore: results of /api/agent/chat keyed by the client's Idempotency-Key.
+  A repeat of a finished request gets the stored result; a repeat of a running one waits
+  for it and gets the same result. The run is its own task, so a client disconnecting
+  doesn't cancel it: the turn still finishes and its result is stored for the retry.
+  Entries expire after `ttl_seconds` and the store holds at most `max_entries`. Failed
+  runs are not stored, so the client can retry.
+
+Both are per process; with several API workers, route a session to one worker.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable
+
+from .config import SESSION_MAX_QUEUED, IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_ENTRIES
+
+
+class SessionBusy(Exception):
+    """Too many turns are already queued for this session."""
+
+
+class IdempotencyKeyReused(ValueError):
+    """The Idempotency-Key was already used for a different request."""
+
+
+class SessionGate:
+    """Per-session FIFO locks; a session's lock is dropped once nothing holds or awaits it."""
+
+    def __init__(self, max_queued: int = 4):
+        self.max_queued = max_queued
+        # thread_id -> [lock, holders + waiters]
+        self._locks: dict[str, list] = {}
+        self._stats = {"runs": 0, "queued": 0, "rejected": 0}
+
+    @asynccontextmanager
+    async def hold(self, thread_id: str):
+        slot = self._locks.get(thread_id)
+        if slot is None:
+            slot = self._locks[thread_id] = [asyncio.Lock(), 0]
+        elif slot[1] > self.max_queued:
+            self._stats["rejected"] += 1
+            raise SessionBusy(f"{slot[1]} turns already running or queued for this session")
+        if slot[0].locked():
+            self._stats["queued"] += 1
+        slot[1] += 1
+        try:
+            # asyncio.Lock wakes waiters in arrival order
+            async with slot[0]:
+                self._stats["runs"] += 1
+                yield
+        finally:
+            slot[1] -= 1
+            if slot[1] == 0:
+                self._locks.pop(thread_id, None)
+
+    def stats(self) -> dict:
+        return {**self._stats, "active_sessions": len(self._locks)}
+
+
+def request_fingerprint(*parts: Any) -> str:
+    return hashlib.sha256("\x00".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """TTL- and size-bounded map of idempotency key -> (fingerprint, future result)."""
+
+    def __init__(self, ttl_seconds: float = 600, max_entries: int = 10000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        # key -> (expires_at, fingerprint, task); one TTL for all, so insertion order is expiry order
+        self._entries: OrderedDict[str, tuple[float, str, asyncio.Future]] = OrderedDict()
+        self._stats = {"executed": 0, "replayed": 0, "attached": 0, "evicted": 0}
+
+    def _purge(self):
+        now = time.monotonic()
+        while self._entries:
+            key, (expires_at, _, future) = next(iter(self._entries.items()))
+            over_capacity = len(self._entries) > self.max_entries
+            # Over capacity, still-running entries stay: requests attached to them need them
+            if expires_at > now and not (over_capacity and future.done()):
+                break
+            del self._entries[key]
+            self._stats["evicted"] += 1
+
+    async def run(self, key: str, fingerprint: str, fn: Callable[[], Awaitable[Any]], keep: bool = True) -> Any:
+        """
+        Returns fn()'s result, running it only if no live entry exists for `key`.
+        With keep=False the entry only dedupes while fn() runs and is dropped afterwards.
+        fn() runs in a task of its own; cancelling the caller doesn't cancel it.
+        """
+        self._purge()
+        entry = self._entries.get(key)
+        if entry is not None:
+            _, stored_fingerprint, future = entry
+            if stored_fingerprint != fingerprint:
+                raise IdempotencyKeyReused("Idempotency-Key was already used with a different request")
+            self._stats["replayed" if future.done() else "attached"] += 1
+            # Shielded so a client disconnect on the duplicate doesn't cancel the original run
+            return await asyncio.shield(future)
+
+        task = asyncio.create_task(fn())
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, fingerprint, task)
+        self._stats["executed"] += 1
+        task.add_done_callback(lambda done: self._finish(key, done, keep))
+        # Shielded so a client disconnect on this request doesn't cancel the run either
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task, keep: bool):
+        failed = task.cancelled() or task.exception() is not None
+        entry = self._entries.get(key)
+        # Failed runs are not stored: a retry with the same key runs again
+        if (failed or not keep) and entry is not None and entry[2] is task:
+            del self._entries[key]
+
+    def stats(self) -> dict:
+        return {**self._stats, "entries": len(self._entries), "max_entries": self.max_entries}
+
+
+session_gate = SessionGate(max_queued=SESSION_MAX_QUEUED)
+chat_idempotency = IdempotencyStore(ttl_seconds=IDEMPOTENCY_TTL, max_entries=IDEMPOTENCY_MAX_ENTRIES)
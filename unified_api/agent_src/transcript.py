@@ -0,0 +1,368 @@
+"""
+Keeps checkpointed message history bounded.
+
+Graph state only holds the last MESSAGE_WINDOW messages (add_messages_window reducer),
+so checkpoint size stops growing with the length of a session. Every message is also
+appended to the transcript store by the orchestrator's archive_transcript node before
+it can fall out of the window; /api/agent/history pages through the full conversation
+from there.
+
+The store lives next to the checkpoints: a local SQLite file (TRANSCRIPT_DB_PATH) for the
+SQLite backends, and Redis for CHECKPOINTER_BACKEND=redis, so every API worker sharing
+those sessions also sees the same history.
+
+Run `python -m agent_src.transcript` from unified_api/ to compare checkpoint bytes per
+turn with the plain add_messages reducer and the windowed one, and history page latency
+for short and very long sessions.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from typing import Callable, Optional, Sequence
+
+import aiosqlite
+import redis.asyncio as aioredis
+from langchain_core.messages import BaseMessage
+from langgraph.graph.message import add_messages
+
+from .redis_checkpointer import create_pool
+from .config import (
+    MESSAGE_WINDOW,
+    TRANSCRIPT_DB_PATH,
+    TRANSCRIPT_REDIS_PREFIX,
+    CHECKPOINTER_BACKEND,
+    CHECKPOINT_REDIS_TTL,
+    REDIS_HOST,
+    REDIS_PORT,
+    REDIS_DB,
+    REDIS_PASSWORD,
+    REDIS_POOL_SIZE,
+    REDIS_POOL_TIMEOUT,
+    REDIS_SOCKET_TIMEOUT,
+    REDIS_CONNECT_TIMEOUT,
+)
+
+
+def add_messages_window(left: Sequence[BaseMessage], right) -> list[BaseMessage]:
+    """add_messages, keeping only the most recent MESSAGE_WINDOW messages."""
+    return add_messages(left, right)[-MESSAGE_WINDOW:]
+
+
+class TranscriptStore:
+    """
+    Append-only message log per session in SQLite. Appends are idempotent on the
+    message id, so re-archiving a message (e.g. after a retried turn) is harmless.
+    The connection is opened lazily on first use.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._conn: Optional[aiosqlite.Connection] = None
+        self._lock = asyncio.Lock()
+
+    async def _connection(self) -> aiosqlite.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            conn = await aiosqlite.connect(self.db_path)
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS transcript ("
+                "session_id TEXT NOT NULL, seq INTEGER NOT NULL, message_id TEXT NOT NULL, "
+                "role TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL, "
+                "PRIMARY KEY (session_id, seq), UNIQUE (session_id, message_id))"
+            )
+            await conn.commit()
+            self._conn = conn
+        return self._conn
+
+    async def append(self, session_id: str, messages: Sequence[BaseMessage]):
+        """Appends messages in order, skipping ones already stored and ones with no content."""
+        if not messages:
+            return
+        # The lock serializes this process's appends on the shared connection. Other workers
+        # writing the same file are kept out by BEGIN IMMEDIATE, and each seq is computed inside
+        # its INSERT, so two writers can never be handed the same one.
+        async with self._lock:
+            conn = await self._connection()
+            await conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                for msg in messages:
+                    content = msg.content if isinstance(msg.content, str) else str(msg.content)
+                    if not content:
+                        continue
+                    # Only an already-archived message id is skipped; a seq clash still raises
+                    await conn.execute(
+                        "INSERT INTO transcript (session_id, seq, message_id, role, content, created_at) "
+                        "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ?, ?, ? FROM transcript WHERE session_id = ? "
+                        "ON CONFLICT (session_id, message_id) DO NOTHING",
+                        (session_id, msg.id or str(uuid.uuid4()), msg.type, content, now, session_id),
+                    )
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+
+    async def page(
+        self,
+        session_id: str,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        limit: int = 50,
+    ) -> tuple[list[dict], bool]:
+        """
+        Returns up to `limit` messages as {"seq", "role", "content"} dicts in
+        conversation order, plus whether more exist in the direction being paged.
+
+        With `after`, pages forward from that seq (oldest first); otherwise returns the
+        newest messages before `before` (or the newest overall). Every page is a range
+        scan on the (session_id, seq) primary key, so its cost doesn't depend on the
+        length of the session.
+        """
+        conn = await self._connection()
+        if after is not None:
+            query = "SELECT seq, role, content FROM transcript WHERE session_id = ? AND seq > ?"
+            params = [session_id, after]
+            if before is not None:
+                query += " AND seq < ?"
+                params.append(before)
+            query += " ORDER BY seq ASC LIMIT ?"
+        else:
+            query = "SELECT seq, role, content FROM transcript WHERE session_id = ?"
+            params = [session_id]
+            if before is not None:
+                query += " AND seq < ?"
+                params.append(before)
+            query += " ORDER BY seq DESC LIMIT ?"
+        # One extra row tells us whether there is another page
+        params.append(limit + 1)
+        async with conn.execute(query, params) as cursor:
+            rows = await cursor.fetchall()
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if after is None:
+            rows.reverse()
+        return [{"seq": seq, "role": role, "content": content} for seq, role, content in rows], has_more
+
+    async def is_empty(self, session_id: str) -> bool:
+        conn = await self._connection()
+        async with conn.execute("SELECT 1 FROM transcript WHERE session_id = ? LIMIT 1", (session_id,)) as cursor:
+            return await cursor.fetchone() is None
+
+    async def close(self):
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
+
+
+class RedisTranscriptStore:
+    """
+    The same message log on Redis, for API workers sharing sessions. Per session:
+
+        {prefix}:{session}        ZSET  {"seq", "role", "content"} JSON, scored by seq
+        {prefix}:{session}:ids    HASH  message_id -> seq, claimed with HSETNX
+        {prefix}:{session}:seq    STRING  last seq handed out
+
+    A message is appended by whichever call claims its id first, so re-archiving stays
+    harmless across workers. Keys expire `ttl_seconds` after the last append, like the
+    session's checkpoints. The pool is created on first use and dropped by close().
+    """
+
+    def __init__(self, pool_factory: Callable[[], aioredis.ConnectionPool], prefix: str = "transcript", ttl_seconds: Optional[int] = None):
+        self.pool_factory = pool_factory
+        self.prefix = prefix
+        self.ttl_seconds = ttl_seconds or None
+        self._client: Optional[aioredis.Redis] = None
+
+    def _connection(self) -> aioredis.Redis:
+        if self._client is None:
+            self._client = aioredis.Redis(connection_pool=self.pool_factory())
+        return self._client
+
+    async def append(self, session_id: str, messages: Sequence[BaseMessage]):
+        """Appends messages in order, skipping ones already stored and ones with no content."""
+        rows = []
+        for msg in messages:
+            content = msg.content if isinstance(msg.content, str) else str(msg.content)
+            if content:
+                rows.append((msg.id or str(uuid.uuid4()), msg.type, content))
+        if not rows:
+            return
+        client = self._connection()
+        log_key = f"{self.prefix}:{session_id}"
+        ids_key, seq_key = f"{log_key}:ids", f"{log_key}:seq"
+
+        pipe = client.pipeline(transaction=True)
+        for message_id, _, _ in rows:
+            pipe.hsetnx(ids_key, message_id, 0)
+        claimed = [row for row, is_new in zip(rows, await pipe.execute()) if is_new]
+        if not claimed:
+            return
+        # Reserve a block of seqs for the claimed messages
+        last = await client.incrby(seq_key, len(claimed))
+
+        pipe = client.pipeline(transaction=True)
+        for seq, (message_id, role, content) in enumerate(claimed, start=last - len(claimed) + 1):
+            pipe.zadd(log_key, {json.dumps({"seq": seq, "role": role, "content": content}, ensure_ascii=False): seq})
+            pipe.hset(ids_key, message_id, seq)
+        if self.ttl_seconds:
+            for key in (log_key, ids_key, seq_key):
+                pipe.expire(key, self.ttl_seconds)
+        await pipe.execute()
+
+    async def page(
+        self,
+        session_id: str,
+        before: Optional[int] = None,
+        after: Optional[int] = None,
+        limit: int = 50,
+    ) -> tuple[list[dict], bool]:
+        """Same contract as TranscriptStore.page; each page is one range read on the ZSET."""
+        client = self._connection()
+        log_key = f"{self.prefix}:{session_id}"
+        lower = f"({after}" if after is not None else "-inf"
+        upper = f"({before}" if before is not None else "+inf"
+        # One extra row tells us whether there is another page
+        if after is not None:
+            rows = await client.zrangebyscore(log_key, lower, upper, start=0, num=limit + 1)
+        else:
+            rows = await client.zrevrangebyscore(log_key, upper, lower, start=0, num=limit + 1)
+
+        has_more = len(rows) > limit
+        messages = [json.loads(row) for row in rows[:limit]]
+        if after is None:
+            messages.reverse()
+        return messages, has_more
+
+    async def is_empty(self, session_id: str) -> bool:
+        return not await self._connection().exists(f"{self.prefix}:{session_id}")
+
+    async def close(self):
+        if self._client is not None:
+            pool = self._client.connection_pool
+            await self._client.aclose()
+            await pool.disconnect()
+            self._client = None
+
+
+def make_transcript_store():
+    """Transcript store matching CHECKPOINTER_BACKEND."""
+    if CHECKPOINTER_BACKEND == "redis":
+        return RedisTranscriptStore(
+            lambda: create_pool(
+                host=REDIS_HOST,
+                port=REDIS_PORT,
+                db=REDIS_DB,
+                password=REDIS_PASSWORD,
+                max_connections=REDIS_POOL_SIZE,
+                pool_timeout=REDIS_POOL_TIMEOUT,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                connect_timeout=REDIS_CONNECT_TIMEOUT,
+            ),
+            prefix=TRANSCRIPT_REDIS_PREFIX,
+            ttl_seconds=CHECKPOINT_REDIS_TTL,
+        )
+    return TranscriptStore(TRANSCRIPT_DB_PATH)
+
+
+transcript_store = make_transcript_store()
+
+
+if __name__ == "__main__":
+    import tempfile
+    from typing import Annotated, TypedDict
+
+    from langchain_core.messages import AIMessage, HumanMessage
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    from langgraph.graph import StateGraph, END
+
+    TURNS = 200
+    REPLY = "Here is a detailed marketing answer. " * 20
+
+    def build_graph(reducer, checkpointer):
+        class State(TypedDict):
+            messages: Annotated[Sequence[BaseMessage], reducer]
+
+        async def reply(state: State) -> dict:
+            return {"messages": [AIMessage(content=REPLY)]}
+
+        graph = StateGraph(State)
+        graph.add_node("reply", reply)
+        graph.set_entry_point("reply")
+        graph.add_edge("reply", END)
+        return graph.compile(checkpointer=checkpointer)
+
+    async def checkpoint_bytes(conn) -> int:
+        async with conn.execute(
+            "SELECT COALESCE(SUM(LENGTH(checkpoint) + LENGTH(metadata)), 0) FROM checkpoints"
+        ) as cursor:
+            (checkpoints,) = await cursor.fetchone()
+        async with conn.execute("SELECT COALESCE(SUM(LENGTH(value)), 0) FROM writes") as cursor:
+            (writes,) = await cursor.fetchone()
+        return checkpoints + writes
+
+    async def measure(name, reducer):
+        with tempfile.TemporaryDirectory() as tmp:
+            async with AsyncSqliteSaver.from_conn_string(os.path.join(tmp, "checkpoints.sqlite")) as saver:
+                graph = build_graph(reducer, saver)
+                config = {"configurable": {"thread_id": "bench"}}
+                previous = 0
+                per_turn = []
+                for turn in range(TURNS):
+                    await graph.ainvoke({"messages": [HumanMessage(content=f"Question {turn}: how do I grow?")]}, config)
+                    total = await checkpoint_bytes(saver.conn)
+                    per_turn.append(total - previous)
+                    previous = total
+        samples = ", ".join(f"turn {t + 1}: {per_turn[t] / 1024:.1f} KB" for t in (0, 9, 49, 99, TURNS - 1))
+        print(f"{name:>20}: {samples}; total {previous / 1024 / 1024:.1f} MB")
+
+    async def page_latency():
+        with tempfile.TemporaryDirectory() as tmp:
+            store = TranscriptStore(os.path.join(tmp, "transcripts.sqlite"))
+            for size in (10, 10_000):
+                session = f"session-{size}"
+                for start in range(0, size, 1000):
+                    await store.append(session, [
+                        (HumanMessage if i % 2 == 0 else AIMessage)(content=REPLY, id=f"{session}-{i}")
+                        for i in range(start, min(start + 1000, size))
+                    ])
+                t = time.perf_counter()
+                for _ in range(200):
+                    messages, _ = await store.page(session, limit=50)
+                    if len(messages) > 1:
+                        await store.page(session, before=messages[0]["seq"], limit=50)
+                elapsed = (time.perf_counter() - t) / 200
+                print(f"{size:>6} messages: newest page + one older page in {elapsed * 1000:.2f} ms")
+            await store.close()
+
+    async def concurrent_writers():
+        # Two stores on one file stand in for two API workers appending to the same session
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "transcripts.sqlite")
+            stores = [TranscriptStore(path) for _ in range(2)]
+            await stores[0].append("shared", [HumanMessage(content="hello", id="first")])
+
+            async def worker(w: int):
+                for i in range(100):
+                    await stores[w].append("shared", [AIMessage(content=REPLY, id=f"w{w}-{i}")])
+
+            await asyncio.gather(worker(0), worker(1))
+            messages, _ = await stores[0].page("shared", limit=1000)
+            seqs = [m["seq"] for m in messages]
+            assert seqs == list(range(1, 202)), "messages were lost or given duplicate seqs"
+            print(f"2 writers, 200 concurrent appends: {len(messages)} messages, seq 1..{seqs[-1]} without gaps")
+            for store in stores:
+                await store.close()
+
+    async def main():
+        print("Concurrent appends from separate connections")
+        await concurrent_writers()
+        print(f"Checkpoint bytes written per turn over {TURNS} turns (window = {MESSAGE_WINDOW} messages)")
+        await measure("add_messages", add_messages)
+        await measure("add_messages_window", add_messages_window)
+        print("History page latency")
+        await page_latency()
+
+    asyncio.run(main())
@@ -13,20 +13,51 @@ settings = Backend_config()
 logging.basicConfig(level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO))
 logger = logging.getLogger("unified.main")
 
+import asyncio
 from contextlib import asynccontextmanager
-from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from agent_src.orchestrator.orchestrator_graph import compile_workflow
+from agent_src.transcript import transcript_store
+from agent_src.checkpoint_retention import CheckpointRetention
+from agent_src.checkpointer_factory import open_checkpointer
+from agent_src.config import (
+    CHECKPOINTER_BACKEND,
+    CHECKPOINT_RETENTION_ENABLED,
+    CHECKPOINT_KEEP_LAST,
+    CHECKPOINT_MAX_IDLE_DAYS,
+    CHECKPOINT_RETENTION_INTERVAL,
+    CHECKPOINT_RETENTION_BATCH,
+)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Startup: Initialize AsyncSqliteSaver and compile graph
-    async with AsyncSqliteSaver.from_conn_string("checkpoints.sqlite") as checkpointer:
-        logger.info("Initializing AsyncSqliteSaver...")
+    # Startup: Initialize the checkpointer and compile graph
+    async with open_checkpointer() as checkpointer:
+        logger.info(f"Initializing {type(checkpointer).__name__}...")
         graph_app = compile_workflow(checkpointer)
         app.state.graph_app = graph_app
+
+        # One retention loop per SQLite file (each shard of a sharded saver has its own);
+        # Redis checkpoints expire through CHECKPOINT_REDIS_TTL instead
+        app.state.checkpoint_retentions = []
+        retention_tasks = []
+        if CHECKPOINT_RETENTION_ENABLED and CHECKPOINTER_BACKEND != "redis":
+            await checkpointer.setup()
+            for saver in getattr(checkpointer, "shards", [checkpointer]):
+                retention = CheckpointRetention(
+                    saver.conn,
+                    saver.lock,
+                    keep_last=CHECKPOINT_KEEP_LAST,
+                    max_idle_seconds=CHECKPOINT_MAX_IDLE_DAYS * 24 * 3600 or None,
+                    batch_threads=CHECKPOINT_RETENTION_BATCH,
+                )
+                app.state.checkpoint_retentions.append(retention)
+                retention_tasks.append(asyncio.create_task(retention.run_forever(CHECKPOINT_RETENTION_INTERVAL)))
         yield
         # Shutdown: Connection is closed automatically by context manager
-        logger.info("Closing AsyncSqliteSaver...")
+        for task in retention_tasks:
+            task.cancel()
+        logger.info(f"Closing {type(checkpointer).__name__}...")
+        await transcript_store.close()
 
 app = FastAPI(
     title="Unified Marketing Agent API",
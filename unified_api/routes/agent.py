@@ -1,10 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi import APIRouter, HTTPException, Depends, Request, Header
+from fastapi.responses import StreamingResponse
 from langchain_core.messages import HumanMessage
 from agent_src.models import ChatRequest, ChatResponse
+from agent_src.config import STREAM_TAG, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE
+from agent_src.transcript import transcript_store
+from agent_src.checkpoint_cache import CachedCheckpointSaver
+from agent_src.chat_turn import run_turn, TurnResult
+from agent_src.single_flight import (
+    session_gate,
+    chat_idempotency,
+    request_fingerprint,
+    SessionBusy,
+    IdempotencyKeyReused,
+)
 # from agent_src.orchestrator.orchestrator_graph import app as graph_app
 from dependencies import get_current_user
 import uuid
+import json
 import logging
+from typing import Optional
 
 router = APIRouter(prefix="/api/agent", tags=["AI Agent"])
 logger = logging.getLogger("agent.routes")
@@ -20,10 +34,70 @@ async def get_sessions(current_user: dict = Depends(get_current_user)):
     """
     return await auth_service.get_user_sessions(current_user["id"])
 
+@router.get("/metrics")
+async def get_agent_metrics(req: Request, current_user: dict = Depends(get_current_user)):
+    """
+    Returns cache and performance counters for the agent pipeline.
+    """
+    from agent_src.marketing_agent.marketing_nodes import web_search_wrapper, guide_prefetcher, strategy_speculator
+    from agent_src.llm_cache import llm_cache
+    from agent_src.orchestrator.orchestrator_nodes import ROUTER_STATS
+    from agent_src.marketing_agent.reply_parser import parser_stats
+    from agent_src.context_manager import prompt_token_counter
+
+    metrics = {
+        "router": dict(ROUTER_STATS),
+        "reply_parser": parser_stats(),
+        "prompt_tokens": prompt_token_counter.stats(),
+        "session_gate": session_gate.stats(),
+        "idempotency": chat_idempotency.stats(),
+    }
+    if hasattr(web_search_wrapper, "stats"):
+        metrics["search_cache"] = web_search_wrapper.stats()
+    if llm_cache is not None:
+        metrics["llm_cache"] = llm_cache.stats()
+    if guide_prefetcher is not None:
+        metrics["guide_prefetch"] = guide_prefetcher.stats()
+    if strategy_speculator is not None:
+        metrics["strategy_speculation"] = strategy_speculator.stats()
+    from agent_src.marketing_agent.marketing_graph import checkpointer as marketing_checkpointer
+    if hasattr(marketing_checkpointer, "stats"):
+        metrics["marketing_checkpointer"] = marketing_checkpointer.stats()
+    checkpointer = req.app.state.graph_app.checkpointer
+    if isinstance(checkpointer, CachedCheckpointSaver):
+        metrics["checkpoint_cache"] = checkpointer.stats()
+        checkpointer = checkpointer.inner
+    if hasattr(checkpointer, "stats"):
+        metrics["checkpointer"] = checkpointer.stats()
+    retentions = getattr(req.app.state, "checkpoint_retentions", [])
+    if retentions:
+        # Summed across SQLite files (one per shard when sharded)
+        totals = {"free_bytes": 0}
+        for retention in retentions:
+            for key, value in retention.stats().items():
+                if key.startswith("last_pass"):
+                    continue
+                totals[key] = totals.get(key, 0) + value
+            totals["free_bytes"] += await retention.free_bytes()
+        metrics["checkpoint_retention"] = totals
+    return metrics
+
 @router.get("/history")
-async def get_chat_history(req: Request, session_id: str = None, current_user: dict = Depends(get_current_user)):
+async def get_chat_history(
+    req: Request,
+    session_id: str = None,
+    before: Optional[int] = None,
+    after: Optional[int] = None,
+    limit: Optional[int] = None,
+    current_user: dict = Depends(get_current_user),
+):
     """
     Retrieves the chat history for a specific session or the last session.
+    Without `before`, `after` or `limit`, returns the whole conversation, as existing clients expect.
+    Pass `limit` to get only the newest messages, then `before` (the `before_cursor` of the
+    previous response) to load older ones, or `after` to load newer ones; a cursor without
+    `limit` pages HISTORY_PAGE_SIZE messages at a time.
+    Each message carries its `seq`, which is what the cursors refer to.
     """
     user_id = current_user["id"]
     
@@ -33,39 +107,54 @@ async def get_chat_history(req: Request, session_id: str = None, current_user: d
         target_session_id = await auth_service.get_last_session(user_id)
     
     if not target_session_id:
-        return {"messages": [], "session_id": None}
-        
-    graph_app = req.app.state.graph_app
-    config = {"configurable": {"thread_id": target_session_id}}
-    
+        return {"messages": [], "session_id": None, "has_more": False, "before_cursor": None, "after_cursor": None}
+
+    full_history = before is None and after is None and limit is None
+    limit = max(1, min(limit or HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE))
     try:
-        state = await graph_app.aget_state(config)
-        if not state.values:
-             return {"messages": [], "session_id": target_session_id}
-             
-        messages = state.values.get("messages", [])
+        if await transcript_store.is_empty(target_session_id):
+            # Session from before the transcript store existed: materialize it from its checkpoints once.
+            # Each checkpoint only holds the last MESSAGE_WINDOW messages, so walk all retained ones,
+            # oldest first; append() skips the messages already taken from an earlier checkpoint.
+            graph_app = req.app.state.graph_app
+            snapshots = [
+                snapshot
+                async for snapshot in graph_app.aget_state_history({"configurable": {"thread_id": target_session_id}})
+            ]
+            for snapshot in reversed(snapshots):
+                await transcript_store.append(target_session_id, snapshot.values.get("messages", []) if snapshot.values else [])
+
+        if full_history:
+            # Walk back through the pages so the response still holds every message
+            page, has_more = [], True
+            while has_more:
+                older, has_more = await transcript_store.page(
+                    target_session_id, before=page[0]["seq"] if page else None, limit=HISTORY_MAX_PAGE_SIZE
+                )
+                page = older + page
+        else:
+            page, has_more = await transcript_store.page(target_session_id, before=before, after=after, limit=limit)
         # Convert messages to frontend format
-        formatted_messages = []
-        for msg in messages:
-            if isinstance(msg, HumanMessage):
-                formatted_messages.append({"content": msg.content, "isUser": True})
-            elif hasattr(msg, "content") and msg.content:
-                formatted_messages.append({"content": msg.content, "isUser": False})
-                
-        return {"messages": formatted_messages, "session_id": target_session_id}
+        formatted_messages = [
+            {"content": msg["content"], "isUser": msg["role"] == "human", "seq": msg["seq"]}
+            for msg in page
+        ]
+        return {
+            "messages": formatted_messages,
+            "session_id": target_session_id,
+            "has_more": has_more,
+            "before_cursor": page[0]["seq"] if page else None,
+            "after_cursor": page[-1]["seq"] if page else None,
+        }
     except Exception as e:
         logger.error(f"Error fetching history: {str(e)}")
-        return {"messages": [], "session_id": target_session_id}
+        return {"messages": [], "session_id": target_session_id, "has_more": False, "before_cursor": None, "after_cursor": None}
 
-@router.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatRequest, req: Request, current_user: dict = Depends(get_current_user)):
+async def _start_turn(request: ChatRequest, current_user: dict):
     """
-    Endpoint for chat interactions. Provides a session_id if not given, invokes the graph,
-    and returns the assistant's response. Sessions are persisted in Redis for continuity.
+    Resolves the session for a chat turn and builds the graph config and inputs.
+    Shared by the blocking and streaming chat endpoints.
     """
-    # Get graph_app from app state
-    graph_app = req.app.state.graph_app
-
     # Generate or use session_id as thread_id for persistence
     is_new_session = False
     if not request.session_id:
@@ -92,37 +181,135 @@ async def chat_endpoint(request: ChatRequest, req: Request, current_user: dict =
         "user_email": current_user.get("email")
     }
 
-    try:
-        # Stream the graph output (non-streaming for simplicity; can be adapted for SSE)
-        full_response = ""
-        async for chunk in graph_app.astream(inputs, config, recursion_limit=100):
-            for node_name, output_value in chunk.items():
-                if output_value and "messages" in output_value and output_value["messages"]:
-                    content = output_value['messages'][-1].content
-                    if content:
-                        full_response += content + "\n\n"
-
-        if not full_response:
-            # It's possible the graph didn't generate new tokens if it was just a state update or similar,
-            # but usually it should return something.
-            # If it's empty, we might want to check the state or just return empty.
-            # For now, let's assume it's an error if completely empty, or maybe just return empty string.
-            pass 
-
-        # Check if session is complete (e.g., satisfaction=True or no next steps)
-        final_state = await graph_app.aget_state(config)
-        is_complete = bool(final_state.values.get("satisfaction", False)) or not final_state.next
-        
-        # Extract strategies if available
-        strategies = final_state.values.get("strategies")
+    return session_id, config, inputs
+
+def _sse(event: str, data: dict) -> str:
+    """Formats a single Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/chat", response_model=ChatResponse)
+async def chat_endpoint(
+    request: ChatRequest,
+    req: Request,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+):
+    """
+    Endpoint for chat interactions. Provides a session_id if not given, invokes the graph,
+    and returns the assistant's response. Sessions are persisted in Redis for continuity.
+
+    Send an Idempotency-Key header to make retries safe: a repeated key returns the
+    first request's response (waiting for it if it is still running) instead of running
+    the turn again. Turns for the same session run one at a time, in arrival order.
+    """
+    # Get graph_app from app state
+    graph_app = req.app.state.graph_app
+
+    async def execute():
+        session_id, config, inputs = await _start_turn(request, current_user)
+        try:
+            async with session_gate.hold(str(session_id)):
+                # Response text and final state come from one pass, so the checkpoint
+                # this turn wrote is not read back
+                turn = await run_turn(graph_app, inputs, config, recursion_limit=100)
+        except SessionBusy as e:
+            raise HTTPException(status_code=429, detail=str(e))
+        except Exception as e:
+            logger.error(f"Error processing chat: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
         return ChatResponse(
-            response=full_response.strip(),
+            response=turn.response,
             session_id=str(session_id),
-            is_complete=is_complete,
-            strategies=strategies
+            is_complete=turn.is_complete,
+            strategies=turn.values.get("strategies")
         )
 
-    except Exception as e:
-        logger.error(f"Error processing chat: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+    fingerprint = request_fingerprint(request.session_id, request.message)
+    if idempotency_key:
+        key = f"{current_user['id']}:{idempotency_key}"
+        keep = True
+    elif request.session_id:
+        # Without a key, an identical message to the same session only shares a run still in flight
+        # (a double-click); sending it again later is a new turn
+        key = f"{current_user['id']}:inflight:{fingerprint}"
+        keep = False
+    else:
+        return await execute()
+
+    try:
+        return await chat_idempotency.run(key, fingerprint, execute, keep=keep)
+    except IdempotencyKeyReused as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest, req: Request, current_user: dict = Depends(get_current_user)):
+    """
+    Streaming variant of /chat. Emits Server-Sent Events while the graph runs:
+    - node_start / node_end: a graph node (orchestrator or marketing agent) started or finished
+    - token: an LLM token from a user-facing chain
+    - strategy: one parsed strategy (index, text, source URL) as soon as its line is generated
+    - done: the final response text, session_id, is_complete and strategies
+    - error: the turn failed
+    """
+    graph_app = req.app.state.graph_app
+    session_id, config, inputs = await _start_turn(request, current_user)
+
+    async def event_stream():
+        full_response = ""
+        final_values = {}
+        try:
+            async with session_gate.hold(str(session_id)):
+                async for event in graph_app.astream_events(inputs, config, version="v2", recursion_limit=100):
+                    kind = event["event"]
+                    metadata = event.get("metadata", {})
+                    node = metadata.get("langgraph_node")
+                    if node and node.startswith("__"):
+                        # Skip LangGraph's internal __start__ pseudo-node
+                        node = None
+
+                    if kind == "on_chat_model_stream" and STREAM_TAG in event.get("tags", []):
+                        content = event["data"]["chunk"].content
+                        if content:
+                            yield _sse("token", {"node": node, "content": content})
+                    elif kind == "on_custom_event" and event["name"] == "message":
+                        # Text from a call that can't stream (structured output), sent as one token
+                        yield _sse("token", {"node": node, "content": event["data"]["content"]})
+                    elif kind == "on_custom_event" and event["name"] == "strategy":
+                        # A strategy line finished generating, with its source resolved
+                        yield _sse("strategy", {"node": node, **event["data"]})
+                    elif kind == "on_chain_start" and node and event["name"] == node:
+                        yield _sse("node_start", {"node": node})
+                    elif kind == "on_chain_end" and not event.get("parent_ids"):
+                        # The root run ends with the turn's final state
+                        final_values = event["data"].get("output") or {}
+                    elif kind == "on_chain_end" and node and event["name"] == node:
+                        yield _sse("node_end", {"node": node})
+                        # Only top-level nodes contribute to the response, same as /chat
+                        # (the marketing_agent node already returns its subgraph's last message)
+                        if "|" not in metadata.get("langgraph_checkpoint_ns", ""):
+                            output_value = event["data"].get("output")
+                            if isinstance(output_value, dict) and output_value.get("messages"):
+                                content = output_value["messages"][-1].content
+                                if content:
+                                    full_response += content + "\n\n"
+
+            # The graph has no interrupts, so a finished run always has nothing left to execute
+            turn = TurnResult(full_response.strip(), final_values, interrupted=False)
+
+            yield _sse("done", {
+                "response": turn.response,
+                "session_id": str(session_id),
+                "is_complete": turn.is_complete,
+                "strategies": turn.values.get("strategies"),
+            })
+        except Exception as e:
+            logger.error(f"Error streaming chat: {str(e)}")
+            yield _sse("error", {"detail": f"Error processing chat: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )